@@ -0,0 +1,145 @@
+"""
+批量分类：U 盘一次拷入几百个文件、或重新整理归档时使用。
+
+先按文件名判断，剩下的文件并发提取内容，再把所有正文一次性向量化成稀疏矩阵，
+用 predict_proba 批量预测，返回每个文件的学科、置信度和各阶段耗时。
+模型、向量化器和提取函数由调用方传入，托盘程序和批处理脚本共用这一套逻辑。
+"""
+import json
+import time
+import queue
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from model_input import model_text
+
+# ==================== 配置参数 ====================
+CONFIG_FILE = "config.json"
+try:
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        config = json.load(f)
+except FileNotFoundError:
+    config = {}
+
+BATCH_WORKERS = config.get("BATCH_WORKERS", 4)
+BATCH_WINDOW = config.get("BATCH_WINDOW", 2)
+BATCH_MAX_FILES = config.get("BATCH_MAX_FILES", 64)
+# 正文少于该字数时不交给模型
+MIN_CONTENT_CHARS = 30
+
+logger = logging.getLogger(__name__)
+
+
+def _extract_timed(extract_fn, file_path):
+    start = time.perf_counter()
+    try:
+        content = extract_fn(file_path)
+    except Exception as e:
+        logger.info(f"内容提取失败: {file_path} - {e}")
+        content = ""
+    return content, time.perf_counter() - start
+
+
+def classify_many(paths, clf, vectorizer, extract_fn, guess_fn=None, keyword_fn=None, workers=None):
+    """批量分类，按输入顺序返回结果列表
+
+    每个结果为字典：path、subject（无法判断时为 None）、confidence（模型概率，
+    非模型判断时为 None）、source（filename / model / keywords / None）、
+    timings（extract / predict / total，秒）。
+    """
+    started = time.perf_counter()
+    results = []
+    pending = []
+    for file_path in paths:
+        result = {"path": file_path, "subject": None, "confidence": None, "source": None,
+                  "timings": {"extract": 0.0, "predict": 0.0, "total": 0.0}}
+        results.append(result)
+        subject = guess_fn(file_path) if guess_fn else None
+        if subject:
+            result.update(subject=subject, source="filename")
+        else:
+            pending.append(result)
+
+    # 并发提取：重活在 OCR / 隔离进程中，线程只负责等待
+    contents = {}
+    if pending:
+        with ThreadPoolExecutor(max_workers=workers or BATCH_WORKERS) as executor:
+            futures = [(r, executor.submit(_extract_timed, extract_fn, r["path"])) for r in pending]
+            for result, future in futures:
+                content, elapsed = future.result()
+                result["timings"]["extract"] = elapsed
+                contents[result["path"]] = content
+
+    # 一次向量化、一次预测
+    batch = [r for r in pending if len(contents[r["path"]].strip()) >= MIN_CONTENT_CHARS]
+    if batch:
+        start = time.perf_counter()
+        X = vectorizer.transform([model_text(r["path"], contents[r["path"]]) for r in batch])
+        proba = clf.predict_proba(X)
+        best = proba.argmax(axis=1)
+        per_file = (time.perf_counter() - start) / len(batch)
+        for i, result in enumerate(batch):
+            result.update(subject=clf.classes_[best[i]], confidence=float(proba[i, best[i]]), source="model")
+            result["timings"]["predict"] = per_file
+
+    # 正文太短的文件用正文关键词兜底
+    if keyword_fn:
+        for result in pending:
+            content = contents[result["path"]]
+            if result["source"] is None and content:
+                subject = keyword_fn(content)
+                if subject:
+                    result.update(subject=subject, source="keywords")
+
+    for result in results:
+        timings = result["timings"]
+        timings["total"] = timings["extract"] + timings["predict"]
+    logger.info(f"批量分类 {len(results)} 个文件：文件名识别 {len(results) - len(pending)}，"
+                f"模型识别 {len(batch)}，耗时 {time.perf_counter() - started:.1f}s")
+    return results
+
+
+# ==================== 监视目录的微批处理 ====================
+class MicroBatcher:
+    """收集陆续到达的文件，攒够一批或等待窗口结束后交给 handle_batch(paths)
+
+    每个文件至少等待 delay 秒（等复制完成）；第一个文件就绪后再等 window 秒，
+    期间到达且已就绪的文件并入同一批，最多 max_files 个。
+    handle_batch 抛出异常时把整批交给 on_failure(paths)，调用方可以释放这些文件以便重新识别。
+    """
+
+    def __init__(self, handle_batch, delay, window=BATCH_WINDOW, max_files=BATCH_MAX_FILES, on_failure=None):
+        self.handle_batch = handle_batch
+        self.on_failure = on_failure
+        self.delay = delay
+        self.window = window
+        self.max_files = max_files
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def add(self, file_path):
+        self.queue.put((time.monotonic(), file_path))
+
+    def _loop(self):
+        while True:
+            added, file_path = self.queue.get()
+            batch = [file_path]
+            time.sleep(max(0.0, added + self.delay - time.monotonic()))
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_files:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    added, file_path = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                time.sleep(max(0.0, added + self.delay - time.monotonic()))
+                batch.append(file_path)
+            try:
+                self.handle_batch(batch)
+            except Exception as e:
+                logger.info(f"批量分类失败: {e}")
+                if self.on_failure is not None:
+                    self.on_failure(batch)
@@ -0,0 +1,81 @@
+"""
+对比逐个 re.search 的关键词计分与 Aho–Corasick 自动机计分的耗时。
+
+关键词表直接从 file_classifier_canary.py 中读取，不导入托盘程序本身。
+用法：python bench_keywords.py [正文文件1.txt ...] [--repeat 2000]
+未给出正文文件时只测文件名。
+"""
+import ast
+import re
+import time
+import argparse
+from collections import defaultdict
+import keyword_matcher
+
+FILENAMES = [
+    "高一数学必修一 函数的单调性 课件",
+    "2024届高三物理一轮复习 电磁感应 专题训练",
+    "Unit3 Reading 英语 阅读理解 练习",
+    "化学平衡 离子反应 有机化学 复习提纲",
+    "第五课 文化与生活 政治 教案",
+    "IMG_20240315_083012",
+]
+
+
+def load_keywords(path="file_classifier_canary.py"):
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and getattr(node.targets[0], "id", None) == "SUBJECT_KEYWORDS":
+            return ast.literal_eval(node.value)
+    raise ValueError(f"{path} 中没有 SUBJECT_KEYWORDS")
+
+
+def regex_scores(subject_keywords, text):
+    """改动前 guess_by_filename 的计分方式"""
+    scores = defaultdict(int)
+    for subject, keywords in subject_keywords.items():
+        for keyword in keywords:
+            if re.search(keyword, text, re.IGNORECASE):
+                scores[subject] += 1
+    return scores
+
+
+def measure(func, texts, repeat):
+    """返回每段文本的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            func(text)
+    return (time.perf_counter() - start) / repeat / len(texts) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="学科关键词匹配基准测试")
+    parser.add_argument("files", nargs="*", help="提取出的正文（txt）")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    subject_keywords = load_keywords()
+    start = time.perf_counter()
+    matcher = keyword_matcher.KeywordMatcher(subject_keywords)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"关键词 {len(matcher.keywords)} 个，自动机 {len(matcher.goto)} 个状态，构建耗时 {build_ms:.2f}ms")
+
+    cases = [("文件名", FILENAMES, args.repeat)]
+    for path in args.files:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            cases.append((path, [f.read()], max(1, args.repeat // 100)))
+
+    print(f"{'文本':<32}{'字数':>10}{'re.search(us)':>16}{'自动机(us)':>14}{'加速':>8}{'结果一致':>10}")
+    for name, texts, repeat in cases:
+        for text in texts:
+            assert dict(regex_scores(subject_keywords, text)) == dict(matcher.scores(text))
+        old_us = measure(lambda t: regex_scores(subject_keywords, t), texts, repeat)
+        new_us = measure(matcher.scores, texts, repeat)
+        chars = sum(len(t) for t in texts) // len(texts)
+        print(f"{name[:30]:<32}{chars:>10}{old_us:>16.1f}{new_us:>14.1f}{old_us / new_us:>7.1f}x{'是':>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+对比自适应分辨率 OCR 与固定 200 DPI 的速度和准确度。
+
+准确度：页面带有原生文本层时，以原生文本为参照；否则以固定 200 DPI 的识别结果为参照
+（此时只反映两种方式的一致程度）。测试时关闭 OCR 结果缓存并串行执行，保证计时真实；
+两种方式都经 ocr_engine.image_to_string 调用同一个识别后端（装有 tesserocr 时为常驻进程池），只比较分辨率策略。
+
+用法：python bench_ocr_dpi.py 样例1.pdf 样例2.pdf ... [--pages 20]
+"""
+import re
+import time
+import argparse
+import difflib
+import fitz  # PyMuPDF
+import ocr_cache
+import ocr_engine
+import extractors
+
+
+def similarity(text, reference):
+    a = re.sub(r'\s+', '', text)
+    b = re.sub(r'\s+', '', reference)
+    if not b:
+        return 1.0 if not a else 0.0
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+def fixed_ocr(page):
+    binary = ocr_engine.render_binary(page, ocr_engine.OCR_DPI)
+    return ocr_engine.image_to_string(binary)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自适应分辨率 OCR 基准测试")
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--pages", type=int, default=20, help="每个文件最多测试的页数")
+    args = parser.parse_args()
+
+    ocr_cache.CACHE_ENABLED = False
+    totals = {"fixed": 0.0, "adaptive": 0.0}
+    scores = {"fixed": [], "adaptive": []}
+    pages = 0
+    escalated = 0
+
+    for pdf_path in args.pdfs:
+        with fitz.open(pdf_path) as doc:
+            for page_num in range(min(args.pages, len(doc))):
+                page = doc.load_page(page_num)
+                native = page.get_text()
+
+                start = time.perf_counter()
+                fixed_text = fixed_ocr(page)
+                totals["fixed"] += time.perf_counter() - start
+
+                start = time.perf_counter()
+                adaptive_text, _, dpi = ocr_engine.recognize_adaptive(page)
+                totals["adaptive"] += time.perf_counter() - start
+
+                pages += 1
+                escalated += dpi == ocr_engine.OCR_HIGH_DPI
+                if len(native.strip()) >= extractors.PDF_PAGE_MIN_CHARS:
+                    scores["fixed"].append(similarity(fixed_text, native))
+                    scores["adaptive"].append(similarity(adaptive_text, native))
+                else:
+                    scores["adaptive"].append(similarity(adaptive_text, fixed_text))
+
+    if not pages:
+        print("没有可测试的页面")
+        return
+
+    print(f"共 {pages} 页，自适应模式中 {escalated} 页提升到 {ocr_engine.OCR_HIGH_DPI} DPI"
+          f"（低分辨率 {ocr_engine.OCR_LOW_DPI} DPI，置信度阈值 {ocr_engine.OCR_MIN_CONFIDENCE}）")
+    print(f"{'方式':<10}{'页/秒':>10}{'平均准确度':>14}")
+    for name in ("fixed", "adaptive"):
+        rate = pages / totals[name] if totals[name] else float("inf")
+        accuracy = sum(scores[name]) / len(scores[name]) if scores[name] else float("nan")
+        print(f"{name:<10}{rate:>10.2f}{accuracy:>14.1%}")
+    if not scores["fixed"]:
+        print("（测试页没有原生文本层，自适应的准确度为与固定 200 DPI 结果的一致度）")
+
+
+if __name__ == "__main__":
+    main()
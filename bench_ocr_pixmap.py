@@ -0,0 +1,102 @@
+"""
+对比 PDF 页面 OCR 的两条图像路径：
+  旧路径：get_pixmap(RGB) -> 保存临时 PNG -> cv2.imread -> 灰度 -> 二值化
+  新路径：get_pixmap(灰度) -> 零拷贝包装 samples -> 二值化
+每条路径在独立子进程中运行，分别统计单页耗时和峰值内存。
+
+用法：python bench_ocr_pixmap.py 样例.pdf [--pages 10] [--ocr]
+（不加 --ocr 时只测图像准备部分，加上后包含 Tesseract 识别时间）
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import multiprocessing
+import cv2
+import fitz  # PyMuPDF
+import pytesseract
+import ocr_engine
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），无法获取时返回 None"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 if sys.platform != "darwin" else peak / 1024 / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 / 1024
+    except ImportError:
+        return None
+
+
+def png_path(page, do_ocr, temp_dir):
+    pix = page.get_pixmap(dpi=ocr_engine.OCR_DPI)
+    img_path = os.path.join(temp_dir, f"page_{page.number}.png")
+    pix.save(img_path)
+    img = cv2.imread(img_path)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    _, binary = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
+    if do_ocr:
+        pytesseract.image_to_string(binary, lang=ocr_engine.OCR_LANG)
+
+
+def memory_path(page, do_ocr, temp_dir):
+    pix = ocr_engine.render_gray(page)
+    binary = ocr_engine.binarize(ocr_engine.pixmap_to_array(pix)[:, :, 0])
+    if do_ocr:
+        pytesseract.image_to_string(binary, lang=ocr_engine.OCR_LANG)
+
+
+def run(name, pdf_path, pages, do_ocr, queue):
+    func = png_path if name == "png" else memory_path
+    temp_dir = tempfile.mkdtemp()
+    latencies = []
+    tracemalloc.start()
+    try:
+        with fitz.open(pdf_path) as doc:
+            for page_num in range(min(pages, len(doc))):
+                page = doc.load_page(page_num)
+                start = time.perf_counter()
+                func(page, do_ocr, temp_dir)
+                latencies.append(time.perf_counter() - start)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    queue.put((latencies, traced_peak / 1024 / 1024, peak_rss_mb()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 页面 OCR 图像路径基准测试")
+    parser.add_argument("pdf")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--ocr", action="store_true", help="包含 Tesseract 识别时间")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'路径':<8}{'页数':>6}{'平均(ms)':>12}{'最慢(ms)':>12}{'Python峰值(MB)':>18}{'进程峰值(MB)':>16}")
+    for name in ("png", "memory"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=run, args=(name, args.pdf, args.pages, args.ocr, queue))
+        proc.start()
+        latencies, traced_peak, rss_peak = queue.get()
+        proc.join()
+        if not latencies:
+            print(f"{name:<8}没有可测试的页面")
+            continue
+        avg = sum(latencies) / len(latencies) * 1000
+        worst = max(latencies) * 1000
+        rss = f"{rss_peak:.1f}" if rss_peak is not None else "-"
+        print(f"{name:<8}{len(latencies):>6}{avg:>12.1f}{worst:>12.1f}{traced_peak:>18.1f}{rss:>16}")
+
+
+if __name__ == "__main__":
+    main()
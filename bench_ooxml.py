@@ -0,0 +1,74 @@
+"""
+对比 python-docx / python-pptx 对象模型提取与 ooxml 流式提取的耗时和峰值内存。
+
+用法：python bench_ooxml.py 文件1.pptx 文件2.docx ... [--repeat 5]
+"""
+import os
+import time
+import argparse
+import tracemalloc
+import docx
+import pptx
+import ooxml
+
+
+def object_model_docx(file_path):
+    """改动前 extract_docx 的实现"""
+    doc = docx.Document(file_path)
+    return '\n'.join(paragraph.text for paragraph in doc.paragraphs)
+
+
+def object_model_pptx(file_path):
+    """改动前 extract_pptx 的实现"""
+    pres = pptx.Presentation(file_path)
+    text = ""
+    for slide in pres.slides:
+        for shape in slide.shapes:
+            if hasattr(shape, "text"):
+                text += shape.text + "\n"
+    return text
+
+
+EXTRACTORS = {
+    ".docx": (object_model_docx, ooxml.extract_docx),
+    ".pptx": (object_model_pptx, ooxml.extract_pptx),
+}
+
+
+def measure(func, file_path, repeat):
+    """返回 (最快耗时 ms, 峰值内存 MB, 文本长度)"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(file_path)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    text = func(file_path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best * 1000, peak / 1024 / 1024, len(text.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OOXML 文本提取基准测试")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'文件':<32}{'对象模型(ms)':>14}{'流式(ms)':>12}{'加速':>8}"
+          f"{'对象模型峰值(MB)':>18}{'流式峰值(MB)':>14}{'字数':>16}")
+    for file_path in args.files:
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext not in EXTRACTORS:
+            print(f"跳过不支持的文件：{file_path}")
+            continue
+        old_func, new_func = EXTRACTORS[ext]
+        old_ms, old_peak, old_chars = measure(old_func, file_path, args.repeat)
+        new_ms, new_peak, new_chars = measure(new_func, file_path, args.repeat)
+        name = os.path.basename(file_path)[:30]
+        print(f"{name:<32}{old_ms:>14.1f}{new_ms:>12.1f}{old_ms / new_ms:>7.1f}x"
+              f"{old_peak:>18.1f}{new_peak:>14.1f}{f'{old_chars}->{new_chars}':>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+记录托盘程序启动相关的各模块导入耗时和模型加载耗时。
+
+每一项都在新的 Python 进程中测量（包含其依赖的导入），重复多次取最小值；
+未安装的模块标记为"未安装"。
+用法：python bench_startup.py [--repeat 3]
+"""
+import sys
+import argparse
+import subprocess
+
+# 托盘图标出现前必须导入的模块
+STARTUP_MODULES = ["watchdog.observers", "PIL.Image", "pystray", "lazy_loader", "keyword_matcher",
+                   "batch_classify", "extract_cache", "sandbox"]
+# 快速启动模式下延迟到后台预热或第一次使用时导入的模块
+LAZY_MODULES = ["numpy", "cv2", "fitz", "pytesseract", "docx", "pptx", "joblib", "sklearn",
+                "tkinter", "winrt.windows.ui.notifications", "ocr_engine", "extractors", "compact_model"]
+
+MODEL_LOADERS = {
+    "pkl 模型（joblib）": "import joblib; joblib.load('subject_classifier.pkl'); joblib.load('tfidf_vectorizer.pkl')",
+    "紧凑模型（内存映射）": "import compact_model; compact_model.load()",
+}
+
+MEASURE = """
+import time
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+"""
+
+
+def measure(code, repeat):
+    """在新进程中执行代码，返回最短耗时（秒）；失败时返回错误信息"""
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", MEASURE.format(code=code)],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            return proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "失败"
+        elapsed = float(proc.stdout.strip().splitlines()[-1])
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def report(title, items, repeat):
+    print(f"\n{title}")
+    total = 0.0
+    for name, code in items:
+        result = measure(code, repeat)
+        if isinstance(result, float):
+            total += result
+            print(f"  {name:<36}{result * 1000:>10.1f} ms")
+        else:
+            status = "未安装" if "ModuleNotFoundError" in result else result
+            print(f"  {name:<36}{status:>10}")
+    print(f"  {'合计（各自独立测量，含重复依赖）':<36}{total * 1000:>10.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="托盘程序启动耗时基准测试")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print("以下耗时均不含 Python 解释器本身的启动时间")
+    report("启动时导入的模块：", [(m, f"import {m}") for m in STARTUP_MODULES], args.repeat)
+    report("延迟导入的模块：", [(m, f"import {m}") for m in LAZY_MODULES], args.repeat)
+    report("模型加载：", list(MODEL_LOADERS.items()), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+按置信度逐级提前结束的分类级联。
+
+    filename  文件名关键词（不读文件）
+    head      只读前 CASCADE_HEAD_CHARS 字的原生文本（不 OCR）
+    native    在完整提取预算内读取原生文本（不 OCR）
+    ocr       完整提取，必要时 OCR 扫描页、嵌入图片和视频关键帧
+
+开启 NEAR_DUP 时，读到完整原生文本后查近似重复索引（near_dup.py）：模型的概率没有达到阈值，
+但预测的学科与足够相似的已分类文档一致时即采用，不再 OCR；近似重复只用来打破僵局，不会推翻模型的判断。
+文档要等用户确认分类结果（或给出正确学科）后才由托盘程序调用 remember() 加入索引。
+head / native 阶段用 predict_proba 的最高概率判断是否足够可信，达到该阶段阈值即停止；
+最后一级直接采用模型结果，正文太短时用正文关键词兜底。
+每级的结束比例和平均耗时定期写入日志，用来调整阈值、减少不必要的 OCR。
+多个文件一起分类时每一级都批量向量化、批量预测。
+"""
+import json
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import extract_cache
+from model_input import model_text
+
+# ==================== 配置参数 ====================
+CONFIG_FILE = "config.json"
+try:
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        config = json.load(f)
+except FileNotFoundError:
+    config = {}
+
+HEAD_CHARS = config.get("CASCADE_HEAD_CHARS", 300)
+HEAD_THRESHOLD = config.get("CASCADE_HEAD_THRESHOLD", 0.85)
+NATIVE_THRESHOLD = config.get("CASCADE_NATIVE_THRESHOLD", 0.6)
+STATS_INTERVAL = config.get("CASCADE_STATS_INTERVAL", 20)
+EXTRACT_MAX_CHARS = config.get("EXTRACT_MAX_CHARS", 1000)
+EXTRACT_MAX_PAGES = config.get("EXTRACT_MAX_PAGES", 30)
+EXTRACT_TIME_LIMIT = config.get("EXTRACT_TIME_LIMIT", 60)
+EXTRACT_SAMPLE_PAGES = config.get("EXTRACT_SAMPLE_PAGES", True)
+BATCH_WORKERS = config.get("BATCH_WORKERS", 4)
+NEAR_DUP = config.get("NEAR_DUP", True)
+# 正文少于该字数时不交给模型
+MIN_CONTENT_CHARS = 30
+
+STAGES = ["filename", "head", "native", "ocr"]
+STAGE_NAMES = {"filename": "文件名", "head": "开头原生文本", "native": "完整原生文本",
+               "ocr": "OCR", "near_dup": "近似重复", "keywords": "正文关键词", None: "无法识别"}
+
+logger = logging.getLogger(__name__)
+
+
+class Cascade:
+    """get_model() 返回 (clf, vectorizer)；guess_fn(路径) 为文件名判断；keyword_fn(文本) 为正文关键词判断；
+    extract_fn(路径, **预算) 为原生文本提取（如 sandbox.extract）；full_extract_fn(路径) 为带 OCR 的完整提取。
+    """
+
+    def __init__(self, get_model, guess_fn, keyword_fn, extract_fn, full_extract_fn,
+                 head_threshold=HEAD_THRESHOLD, native_threshold=NATIVE_THRESHOLD):
+        self.get_model = get_model
+        self.guess_fn = guess_fn
+        self.keyword_fn = keyword_fn
+        self.extract_fn = extract_fn
+        self.full_extract_fn = full_extract_fn
+        self.thresholds = {"head": head_threshold, "native": native_threshold, "ocr": 0.0}
+        self._stats = {stage: {"reached": 0, "exits": 0, "seconds": 0.0} for stage in STAGES}
+        self._stats["near_dup"] = {"reached": 0, "exits": 0, "seconds": 0.0}
+        self._stats["keywords"] = {"reached": 0, "exits": 0, "seconds": 0.0}
+        self._stats[None] = {"reached": 0, "exits": 0, "seconds": 0.0}
+        self._files = 0
+        self._stats_lock = threading.Lock()
+
+    # ---------- 各级文本 ----------
+    def _stage_text(self, stage, file_path):
+        if stage == "ocr":
+            return self.full_extract_fn(file_path)
+        import extractors
+        if stage == "head":
+            budget = {"max_chars": HEAD_CHARS, "max_pages": EXTRACT_MAX_PAGES,
+                      "time_limit": EXTRACT_TIME_LIMIT, "sample": False, "ocr": False}
+        else:
+            budget = {"max_chars": EXTRACT_MAX_CHARS, "max_pages": EXTRACT_MAX_PAGES,
+                      "time_limit": EXTRACT_TIME_LIMIT, "sample": EXTRACT_SAMPLE_PAGES, "ocr": False}
+        # 超过时间预算时只提取了一部分，预算不同的结果不能混用
+        version = (f"cascade-{stage}-{extractors.EXTRACTOR_VERSION}:"
+                   f"{budget['max_chars']}/{budget['max_pages']}/{budget['time_limit']}/{int(budget['sample'])}")
+        return extract_cache.cached_extract(file_path, lambda p: self.extract_fn(p, **budget), version)
+
+    def _extract_timed(self, stage, file_path):
+        start = time.perf_counter()
+        try:
+            text = self._stage_text(stage, file_path)
+        except Exception as e:
+            logger.info(f"内容提取失败: {file_path} - {e}")
+            text = ""
+        return text or "", time.perf_counter() - start
+
+    def _extract_all(self, stage, results):
+        if len(results) == 1:
+            return [self._extract_timed(stage, results[0]["path"])]
+        with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as executor:
+            return list(executor.map(lambda r: self._extract_timed(stage, r["path"]), results))
+
+    # ---------- 近似重复 ----------
+    def _match_near_dup(self, results, contents):
+        """用完整原生文本（最多 near_dup.MAX_CHARS 字）计算签名并查询索引，签名和命中的 (key, 学科, 相似度) 记在结果中"""
+        import near_dup
+        index = near_dup.get_index()
+        for result in results:
+            start = time.perf_counter()
+            result["signature"] = near_dup.signature(contents[result["path"]])
+            result["near_dup"] = index.query(result["signature"])
+            result["timings"]["near_dup"] = time.perf_counter() - start
+
+    def remember(self, result, subject):
+        """用户确认或纠正后更新近似重复索引：subject 为确认（纠正）后的学科，否定且没有给出正确学科时为 None。
+        沿用近似重复文档的学科却被否定时，那个文档也一并改正（或删除）"""
+        import near_dup
+        index = near_dup.get_index()
+        try:
+            key = extract_cache.fingerprint(result["path"])
+        except OSError as e:
+            logger.info(f"更新近似重复索引失败: {result['path']} - {e}")
+            return
+        if subject is None:
+            index.remove(key)
+        elif result["signature"] is not None:
+            index.add(key, result["signature"], subject)
+        else:
+            index.relabel(key, subject)
+        match = result["near_dup"]
+        if result["source"] == "near_dup" and match is not None and subject != result["subject"]:
+            if subject is None:
+                index.remove(match[0])
+            else:
+                index.relabel(match[0], subject)
+
+    # ---------- 分类 ----------
+    def classify_many(self, paths):
+        """按输入顺序返回结果列表：path、subject、confidence、source（结束的阶段）、timings（各阶段秒数），
+        以及 text（最后一级读到的文本）、signature（近似重复签名）和 near_dup（命中的近似重复文档）"""
+        results = [{"path": p, "subject": None, "confidence": None, "source": None,
+                    "text": None, "signature": None, "near_dup": None, "timings": {}} for p in paths]
+
+        pending = []
+        for result in results:
+            start = time.perf_counter()
+            subject = self.guess_fn(result["path"])
+            result["timings"]["filename"] = time.perf_counter() - start
+            if subject:
+                result.update(subject=subject, source="filename")
+            else:
+                pending.append(result)
+
+        previous = {}
+        complete = set()
+        latest = {}
+        for stage in STAGES[1:]:
+            if not pending:
+                break
+            final = stage == "ocr"
+            # 开头阶段已读完全文的文件，完整原生文本不会更多，直接进入 OCR 阶段
+            skipped = {r["path"] for r in pending if stage == "native" and r["path"] in complete}
+            to_extract = [r for r in pending if r["path"] not in skipped]
+            contents = {path: previous[path] for path in skipped}
+            for result, (text, elapsed) in zip(to_extract, self._extract_all(stage, to_extract)):
+                result["timings"][stage] = elapsed
+                contents[result["path"]] = text
+                if stage == "head" and len(text.strip()) < HEAD_CHARS:
+                    complete.add(result["path"])
+            if stage == "native" and NEAR_DUP:
+                self._match_near_dup(pending, contents)
+
+            batch = [r for r in to_extract if len(contents[r["path"]].strip()) >= MIN_CONTENT_CHARS]
+            predictions = {}
+            if batch:
+                start = time.perf_counter()
+                clf, vectorizer = self.get_model()
+                X = vectorizer.transform([model_text(r["path"], contents[r["path"]]) for r in batch])
+                proba = clf.predict_proba(X)
+                best = proba.argmax(axis=1)
+                per_file = (time.perf_counter() - start) / len(batch)
+                for i, result in enumerate(batch):
+                    predictions[result["path"]] = (clf.classes_[best[i]], float(proba[i, best[i]]))
+                    result["timings"][stage] = result["timings"].get(stage, 0.0) + per_file
+            latest.update(predictions)
+
+            still = []
+            for result in pending:
+                result["text"] = contents[result["path"]]
+                prediction = predictions.get(result["path"])
+                # 本阶段没有重新预测的文件（已读完全文）沿用上一阶段的预测
+                agreed = latest.get(result["path"])
+                match = result["near_dup"]
+                if prediction and prediction[1] >= self.thresholds[stage]:
+                    result.update(subject=prediction[0], confidence=prediction[1], source=stage)
+                elif match is not None and match[1] and agreed and str(agreed[0]) == match[1]:
+                    # 模型不够确定，但与近似重复的已分类文档学科一致，不必再 OCR
+                    result.update(subject=agreed[0], confidence=agreed[1], source="near_dup")
+                elif final:
+                    content = contents[result["path"]]
+                    subject = self.keyword_fn(content) if content else None
+                    if subject:
+                        result.update(subject=subject, source="keywords")
+                else:
+                    still.append(result)
+            previous = contents
+            pending = still
+
+        for result in results:
+            self._record(result)
+        return results
+
+    def classify(self, file_path):
+        return self.classify_many([file_path])[0]
+
+    # ---------- 统计 ----------
+    def _record(self, result):
+        with self._stats_lock:
+            self._files += 1
+            for stage, seconds in result["timings"].items():
+                self._stats[stage]["reached"] += 1
+                self._stats[stage]["seconds"] += seconds
+            self._stats[result["source"]]["exits"] += 1
+            files = self._files
+        if files % STATS_INTERVAL == 0:
+            logger.info(f"级联统计: {self.format_stats()}")
+
+    def stats(self):
+        with self._stats_lock:
+            return self._files, {k: dict(v) for k, v in self._stats.items()}
+
+    def format_stats(self):
+        files, stats = self.stats()
+        if not files:
+            return "尚无文件"
+        parts = []
+        for stage in STAGES:
+            s = stats[stage]
+            avg = s["seconds"] / s["reached"] if s["reached"] else 0.0
+            parts.append(f"{STAGE_NAMES[stage]}结束{s['exits'] / files:.0%}（到达{s['reached']}，平均{avg:.2f}s）")
+        for source in ("near_dup", "keywords", None):
+            if stats[source]["exits"]:
+                parts.append(f"{STAGE_NAMES[source]}{stats[source]['exits'] / files:.0%}")
+        return f"共{files}个文件：" + "，".join(parts)
@@ -0,0 +1,192 @@
+"""
+紧凑模型格式与纯 NumPy 推理。
+
+托盘程序原先通过 joblib 反序列化 TfidfVectorizer 和 LogisticRegression，
+启动时要导入整个 scikit-learn 并重建一个几万项的 Python 词表字典，耗时数秒。
+train.py 可以把同一模型导出到 compact_model 目录：
+
+    terms.npy      按字典序排列的词项（定长 Unicode 数组）
+    idf.npy        对应词项的 idf
+    coef.npy       系数矩阵（类别数 x 词项数），列顺序与 terms 一致
+    intercept.npy  截距
+    meta.json      类别、分词和归一化参数
+
+加载时各数组以内存映射方式打开，词项通过二分查找（searchsorted）定位，
+不导入 sklearn。CompactVectorizer / CompactClassifier 提供与 sklearn 相同的
+transform、predict、predict_proba 和 classes_，可直接替换原来的 vectorizer / clf。
+只支持 TF-IDF（word 分词）+ 线性分类器，哈希特征模型仍使用 pkl。
+"""
+import os
+import re
+import json
+import numpy as np
+
+MODEL_DIR = "compact_model"
+FORMAT_VERSION = 1
+
+
+# ==================== 导出 ====================
+def export(clf, vectorizer, model_dir=MODEL_DIR):
+    """把训练好的 TfidfVectorizer + 线性分类器写成紧凑格式，返回写出的总字节数"""
+    if getattr(vectorizer, "analyzer", None) != "word" or not hasattr(vectorizer, "vocabulary_"):
+        raise ValueError("只支持按词分析的 TfidfVectorizer")
+    if vectorizer.preprocessor is not None or vectorizer.tokenizer is not None \
+            or vectorizer.strip_accents is not None or vectorizer.stop_words is not None:
+        raise ValueError("不支持自定义预处理、分词、去重音或停用词")
+    if not hasattr(clf, "coef_"):
+        raise ValueError("只支持线性分类器")
+
+    terms = sorted(vectorizer.vocabulary_)
+    columns = np.array([vectorizer.vocabulary_[t] for t in terms])
+    idf = vectorizer.idf_[columns] if vectorizer.use_idf else np.ones(len(terms))
+    coef = np.ascontiguousarray(clf.coef_[:, columns])
+
+    meta = {
+        "format": FORMAT_VERSION,
+        "classes": [str(c) for c in clf.classes_],
+        "lowercase": vectorizer.lowercase,
+        "token_pattern": vectorizer.token_pattern,
+        "ngram_range": list(vectorizer.ngram_range),
+        "binary": vectorizer.binary,
+        "sublinear_tf": vectorizer.sublinear_tf,
+        "norm": vectorizer.norm,
+        "ovr": is_ovr(clf),
+    }
+    return _write(model_dir, np.array(terms, dtype=str), idf, coef, clf.intercept_, meta)
+
+
+def save(clf, vectorizer, model_dir):
+    """把（可能已被在线更新修改过的）CompactClassifier / CompactVectorizer 写到新目录"""
+    return _write(model_dir, vectorizer.terms, vectorizer.idf, clf.coef, clf.intercept, clf.meta)
+
+
+def is_ovr(clf):
+    """sklearn 线性分类器的 predict_proba 是否按一对多（逐类 sigmoid 后归一化）计算"""
+    multi_class = getattr(clf, "multi_class", "auto")
+    return (multi_class == "ovr" or len(clf.classes_) <= 2
+            or not hasattr(clf, "solver") or getattr(clf, "solver", None) == "liblinear")
+
+
+def _write(model_dir, terms, idf, coef, intercept, meta):
+    os.makedirs(model_dir, exist_ok=True)
+    np.save(os.path.join(model_dir, "terms.npy"), np.asarray(terms))
+    np.save(os.path.join(model_dir, "idf.npy"), np.asarray(idf, dtype=np.float64))
+    np.save(os.path.join(model_dir, "coef.npy"), np.asarray(coef, dtype=np.float64))
+    np.save(os.path.join(model_dir, "intercept.npy"), np.asarray(intercept, dtype=np.float64))
+    # meta.json 最后写入，存在即表示导出完整
+    with open(os.path.join(model_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return sum(os.path.getsize(os.path.join(model_dir, name)) for name in os.listdir(model_dir))
+
+
+# ==================== 推理 ====================
+def exists(model_dir=MODEL_DIR):
+    return os.path.exists(os.path.join(model_dir, "meta.json"))
+
+
+class CompactMatrix:
+    """transform 的结果：每个文档一行 (词项下标, tf-idf 值)"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.shape = (len(rows), None)
+
+
+class CompactVectorizer:
+    def __init__(self, terms, idf, meta):
+        self.terms = terms
+        self.idf = idf
+        self.meta = meta
+        self.lowercase = meta["lowercase"]
+        self.token_re = re.compile(meta["token_pattern"])
+        self.min_n, self.max_n = meta["ngram_range"]
+        self.binary = meta["binary"]
+        self.sublinear_tf = meta["sublinear_tf"]
+        self.norm = meta["norm"]
+
+    def analyze(self, doc):
+        """与 TfidfVectorizer 的 word 分析器一致：小写、按 token_pattern 分词、生成 n-gram"""
+        if self.lowercase:
+            doc = doc.lower()
+        tokens = self.token_re.findall(doc)
+        min_n, max_n = self.min_n, self.max_n
+        if max_n == 1:
+            return tokens
+        grams = list(tokens) if min_n == 1 else []
+        min_n = max(min_n, 2)
+        for n in range(min_n, min(max_n, len(tokens)) + 1):
+            for i in range(len(tokens) - n + 1):
+                grams.append(" ".join(tokens[i:i + n]))
+        return grams
+
+    def transform_one(self, doc):
+        grams = self.analyze(doc)
+        if not grams or not len(self.terms):
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        query = np.array(grams, dtype=str)
+        pos = np.searchsorted(self.terms, query)
+        pos[pos >= len(self.terms)] = 0
+        hit = self.terms[pos] == query
+        index, counts = np.unique(pos[hit], return_counts=True)
+        values = counts.astype(np.float64)
+        if self.binary:
+            values[:] = 1.0
+        elif self.sublinear_tf:
+            values = np.log(values) + 1.0
+        values *= self.idf[index]
+        if self.norm == "l2" and len(values):
+            values /= np.sqrt(np.dot(values, values))
+        elif self.norm == "l1" and len(values):
+            values /= np.abs(values).sum()
+        return index, values
+
+    def transform(self, docs):
+        return CompactMatrix([self.transform_one(doc) for doc in docs])
+
+
+class CompactClassifier:
+    def __init__(self, coef, intercept, meta):
+        self.coef = coef
+        self.intercept = intercept
+        self.meta = meta
+        self.classes_ = np.array(meta["classes"])
+        self.ovr = meta["ovr"]
+
+    def decision_function(self, X):
+        scores = np.empty((len(X.rows), self.coef.shape[0]))
+        for i, (index, values) in enumerate(X.rows):
+            scores[i] = self.coef[:, index] @ values + self.intercept
+        return scores
+
+    def predict(self, X):
+        scores = self.decision_function(X)
+        if scores.shape[1] == 1:
+            return self.classes_[(scores[:, 0] > 0).astype(int)]
+        return self.classes_[scores.argmax(axis=1)]
+
+    def predict_proba(self, X):
+        scores = self.decision_function(X)
+        if scores.shape[1] == 1:
+            p = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1 - p, p])
+        if self.ovr:
+            p = 1.0 / (1.0 + np.exp(-scores))
+            return p / p.sum(axis=1, keepdims=True)
+        scores -= scores.max(axis=1, keepdims=True)
+        p = np.exp(scores)
+        return p / p.sum(axis=1, keepdims=True)
+
+
+def load(model_dir=MODEL_DIR):
+    """以内存映射方式加载紧凑模型，返回 (clf, vectorizer)"""
+    with open(os.path.join(model_dir, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != FORMAT_VERSION:
+        raise ValueError(f"不支持的紧凑模型格式版本：{meta.get('format')}")
+
+    def array(name):
+        return np.load(os.path.join(model_dir, name + ".npy"), mmap_mode="r")
+
+    vectorizer = CompactVectorizer(array("terms"), array("idf"), meta)
+    clf = CompactClassifier(array("coef"), np.asarray(array("intercept")), meta)
+    return clf, vectorizer
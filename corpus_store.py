@@ -0,0 +1,233 @@
+"""
+单文件、追加写入的训练语料库。
+
+extract.py 原先为每个源文件写一个 txt，train.py 再逐个打开读取；在 Windows 和网络盘上，
+成千上万个小文件的打开、关闭开销远大于读取本身。现在所有文档写进同一个文件（corpus.store）：
+
+    文件头   MAGIC
+    记录     <II>（元数据字节数, 正文字节数） + 元数据 JSON + 正文（UTF-8）
+
+元数据包含 source（相对路径，作为记录的键）、label（学科）、fingerprint（源文件内容指纹）
+和 version（提取器版本）。同一 source 的新记录覆盖旧记录，deleted 记录表示删除；
+来源、指纹、版本和学科都未变化时不重复写入，读取时内容指纹相同的文档只保留一份。
+读取时以内存映射方式顺序扫描一遍建立索引（只解析元数据），正文按偏移切片读取。
+崩溃留下的半条记录在扫描时忽略，下次写入前截掉；被覆盖的记录超过一半时 extract.py 会压缩文件。
+"""
+import os
+import json
+import mmap
+import struct
+import threading
+
+STORE_NAME = "corpus.store"
+MAGIC = b"CSTORE1\n"
+_HEADER = struct.Struct("<II")
+
+
+class CorpusStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._index = None    # source -> (元数据, 记录起始偏移, 正文偏移, 正文字节数)
+        self._stamp = None
+        self._end = 0         # 最后一条完整记录的结束位置
+        self._map = None
+
+    # ---------- 索引 ----------
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _scan(self):
+        index = {}
+        end = 0
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    if data[:len(MAGIC)] != MAGIC:
+                        raise ValueError(f"不是语料库文件：{self.path}")
+                    pos = end = len(MAGIC)
+                    while pos + _HEADER.size <= size:
+                        meta_len, text_len = _HEADER.unpack_from(data, pos)
+                        text_start = pos + _HEADER.size + meta_len
+                        if text_start + text_len > size:
+                            break  # 写了一半的记录
+                        meta = json.loads(data[pos + _HEADER.size:text_start].decode("utf-8"))
+                        if meta.get("deleted"):
+                            index.pop(meta["source"], None)
+                        else:
+                            index[meta["source"]] = (meta, pos, text_start, text_len)
+                        pos = end = text_start + text_len
+                finally:
+                    data.close()
+        return index, end
+
+    def _ensure_index(self):
+        """文件被其他进程修改过（大小或修改时间变化）时重新扫描"""
+        stamp = self._file_stamp()
+        if self._index is not None and stamp == self._stamp:
+            return
+        self._close_map()
+        if stamp is None:
+            self._index, self._end = {}, 0
+        else:
+            self._index, self._end = self._scan()
+        self._stamp = stamp
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    # ---------- 读取 ----------
+    def __len__(self):
+        with self._lock:
+            self._ensure_index()
+            return len(self._index)
+
+    def __contains__(self, source):
+        with self._lock:
+            self._ensure_index()
+            return source in self._index
+
+    def sources(self):
+        with self._lock:
+            self._ensure_index()
+            return set(self._index)
+
+    def get(self, source):
+        """source 的元数据，不存在时返回 None"""
+        with self._lock:
+            self._ensure_index()
+            entry = self._index.get(source)
+            return dict(entry[0]) if entry else None
+
+    def entries(self, dedup=True):
+        """按写入顺序返回有效记录的元数据；dedup 时内容指纹相同的只保留第一条"""
+        with self._lock:
+            self._ensure_index()
+            ordered = sorted(self._index.values(), key=lambda e: e[1])
+        seen = set()
+        result = []
+        for meta, _, _, _ in ordered:
+            fingerprint = meta.get("fingerprint")
+            if dedup and fingerprint:
+                if fingerprint in seen:
+                    continue
+                seen.add(fingerprint)
+            result.append(dict(meta))
+        return result
+
+    def read(self, source):
+        """读取 source 的正文"""
+        with self._lock:
+            self._ensure_index()
+            _, _, start, length = self._index[source]
+            if self._map is None or len(self._map) < start + length:
+                self._close_map()
+                with open(self.path, "rb") as f:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map[start:start + length].decode("utf-8")
+
+    def iter_records(self, dedup=True):
+        """按文件顺序依次返回 (元数据, 正文)"""
+        for meta in self.entries(dedup):
+            yield meta, self.read(meta["source"])
+
+    # ---------- 写入 ----------
+    def append(self, label, source, fingerprint, version, text):
+        """写入一条记录；与当前记录完全相同时跳过并返回 False"""
+        with self._lock:
+            self._ensure_index()
+            current = self._index.get(source)
+            if current is not None:
+                meta = current[0]
+                if (meta["label"], meta["fingerprint"], meta["version"]) == (label, fingerprint, version):
+                    return False
+            self._write({"source": source, "label": label, "fingerprint": fingerprint,
+                         "version": version}, text.encode("utf-8"))
+            return True
+
+    def remove(self, source):
+        """追加一条删除记录"""
+        with self._lock:
+            self._ensure_index()
+            if source not in self._index:
+                return False
+            self._write({"source": source, "deleted": True}, b"")
+            return True
+
+    def _write(self, meta, text):
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        self._close_map()
+        with open(self.path, "ab") as f:
+            if self._end == 0:
+                f.truncate(0)
+                f.write(MAGIC)
+                self._end = len(MAGIC)
+            elif f.tell() > self._end:
+                f.truncate(self._end)  # 截掉上次崩溃留下的半条记录
+            start = self._end
+            f.seek(start)
+            f.write(_HEADER.pack(len(meta_bytes), len(text)))
+            f.write(meta_bytes)
+            f.write(text)
+        text_start = start + _HEADER.size + len(meta_bytes)
+        self._end = text_start + len(text)
+        if meta.get("deleted"):
+            self._index.pop(meta["source"], None)
+        else:
+            self._index[meta["source"]] = (meta, start, text_start, len(text))
+        self._stamp = self._file_stamp()
+
+    # ---------- 压缩 ----------
+    def garbage_ratio(self):
+        """被覆盖、删除的记录占文件的比例"""
+        with self._lock:
+            self._ensure_index()
+            if self._end <= len(MAGIC):
+                return 0.0
+            live = sum(text_start + length - start for _, start, text_start, length in self._index.values())
+            return 1.0 - live / (self._end - len(MAGIC))
+
+    def compact(self):
+        """只保留有效记录重写文件，返回节省的字节数"""
+        with self._lock:
+            self._ensure_index()
+            before = self._end
+            tmp = CorpusStore(self.path + ".tmp")
+            if os.path.exists(tmp.path):
+                os.remove(tmp.path)
+            for meta, _, _, _ in sorted(self._index.values(), key=lambda e: e[1]):
+                tmp.append(meta["label"], meta["source"], meta["fingerprint"], meta["version"],
+                           self.read(meta["source"]))
+            if not os.path.exists(tmp.path):
+                with open(tmp.path, "wb") as f:
+                    f.write(MAGIC)
+            self._close_map()
+            os.replace(tmp.path, self.path)
+            self._index = None
+            self._ensure_index()
+            return before - self._end
+
+    def close(self):
+        with self._lock:
+            self._close_map()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path):
+    """同一路径共用一个 CorpusStore（及其索引）"""
+    path = os.path.abspath(path)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = CorpusStore(path)
+        return _stores[path]
@@ -1,15 +1,16 @@
 import os
 import re
-from docx import Document
-from pptx import Presentation
 import PyPDF2
-from PIL import Image
 import pytesseract
-import cv2
-import tempfile
-import fitz  # PyMuPDF
-import shutil
 import json
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import ocr_engine
+import extract_cache
+import ooxml
+import extractors
+import corpus_store
 
 # 设置 Tesseract 路径
 CONFIG_FILE = "config.json"
@@ -21,14 +22,18 @@ except FileNotFoundError:
     exit(1)
 pytesseract.pytesseract.tesseract_cmd = config["TESSERACT_PATH"]
 
+# 提取逻辑变化时递增，使提取缓存中的旧结果失效
+EXTRACTOR_VERSION = 3
+# 清单、提取缓存和语料库记录的版本：本脚本或 extractors 任一升级，已提取的文件都重新提取
+EXTRACT_VERSION = f"{EXTRACTOR_VERSION}-{extractors.EXTRACTOR_VERSION}"
+
 def clean_text(text):
     return re.sub(r'\s+', ' ', text).strip()
 
 
 def extract_docx(file_path):
     try:
-        doc = Document(file_path)
-        return '\n'.join(paragraph.text for paragraph in doc.paragraphs)
+        return ooxml.extract_docx(file_path)
     except Exception as e:
         print(f"DOCX提取失败: {file_path} - {e}")
         return ""
@@ -36,13 +41,7 @@ def extract_docx(file_path):
 
 def extract_pptx(file_path):
     try:
-        pres = Presentation(file_path)
-        text = ""
-        for slide in pres.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text += shape.text + "\n"
-        return text
+        return ooxml.extract_pptx(file_path)
     except Exception as e:
         print(f"PPTX提取失败: {file_path} - {e}")
         return ""
@@ -59,73 +58,198 @@ def extract_pdf(file_path):
 
 
 def ocr_pdf(pdf_path):
-    """将 PDF 转为图像后 OCR 提取文本"""
-    doc = fitz.open(pdf_path)
-    temp_dir = tempfile.mkdtemp()
-    texts = []
-
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        pix = page.get_pixmap(dpi=200)
-        img_path = os.path.join(temp_dir, f"page_{page_num}.png")
-        pix.save(img_path)
-        texts.append(ocr_image(img_path))
-
-    shutil.rmtree(temp_dir)
-    return '\n'.join(texts)
+    """将 PDF 转为图像后 OCR 提取文本（按页并行）"""
+    return ocr_engine.ocr_pdf(pdf_path)
 
 
 def ocr_image(image_path):
     """对图像进行 OCR 识别"""
-    try:
-        img = cv2.imread(image_path)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        _, binary = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
-        # OCR 识别
-        text = pytesseract.image_to_string(binary, lang='chi_sim')
+    return ocr_engine.ocr_image(image_path)
+
+
+def with_embedded_ocr(file_path, text):
+    """截图贴成的课件几乎没有原生文本，此时补充嵌入图片的 OCR 结果"""
+    if len(clean_text(text)) >= extractors.EMBEDDED_OCR_MIN_TEXT:
         return text
+    try:
+        return '\n'.join([text] + extractors.ocr_embedded_images(file_path))
     except Exception as e:
-        print(f"OCR识别失败: {image_path} - {e}")
-        return ""
+        print(f"嵌入图片OCR失败: {file_path} - {e}")
+        return text
 
 
 def extract_content(file_path):
     ext = os.path.splitext(file_path)[1].lower()
     if ext == ".docx":
-        return extract_docx(file_path)
+        return with_embedded_ocr(file_path, extract_docx(file_path))
     elif ext == ".pptx":
-        return extract_pptx(file_path)
+        return with_embedded_ocr(file_path, extract_pptx(file_path))
     elif ext == ".pdf":
         return extract_pdf(file_path)
     else:
         return ""
 
 
-def process_folder(data_dir, output_dir):
+# ==================== 批量提取 ====================
+MANIFEST_NAME = ".extract_manifest.json"
+MANIFEST_SAVE_EVERY = 50
+# 写入单个语料库文件（corpus.store），关闭时按学科目录逐个写 txt
+CORPUS_STORE = config.get("CORPUS_STORE", True)
+# 被覆盖、删除的记录超过该比例时压缩语料库
+STORE_COMPACT_RATIO = 0.5
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir, manifest):
+    """先写临时文件再替换，中途崩溃也不会留下损坏的清单"""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def is_up_to_date(entry, file_path, output_dir):
+    """清单记录与源文件一致、提取器版本相同且输出仍在时跳过；大小/时间变了再比对内容指纹"""
+    if entry is None or entry.get("version") != EXTRACT_VERSION:
+        return False
+    if entry["out"] and not os.path.exists(os.path.join(output_dir, entry["out"])):
+        return False
+    stat = os.stat(file_path)
+    if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+        return True
+    if entry["size"] == stat.st_size and entry["hash"] == extract_cache.fingerprint(file_path):
+        entry["mtime"] = stat.st_mtime_ns
+        return True
+    return False
+
+
+def _init_worker():
+    # 已经按文件并行，单个文件内的 OCR 不再另开进程池
+    ocr_engine.set_worker_count(1)
+
+
+def extract_one(file_path, output_dir, rel_out):
+    """提取单个文件，返回 (清单记录, 正文)（在工作进程中执行）
+
+    写入语料库时正文交回主进程统一追加；否则在这里写出 txt，正文返回 None。
+    """
+    stat = os.stat(file_path)
+    content = extract_cache.cached_extract(file_path, extract_content, f"extract.py-{EXTRACT_VERSION}")
+    cleaned = clean_text(content or "")
+    entry = {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "hash": extract_cache.fingerprint(file_path),
+        "version": EXTRACT_VERSION,
+        "out": None,
+    }
+    if not cleaned or len(cleaned) < 30:
+        return entry, None
+    entry["out"] = rel_out
+    if rel_out == corpus_store.STORE_NAME:
+        return entry, cleaned
+    with open(os.path.join(output_dir, rel_out), "w", encoding="utf-8", errors="ignore") as f:
+        f.write(cleaned)
+    return entry, None
+
+
+def process_folder(data_dir, output_dir, workers=None):
+    """多进程批量提取；清单记录已完成的文件，中断后重跑只处理新增或变化的文件"""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    store = corpus_store.CorpusStore(os.path.join(output_dir, corpus_store.STORE_NAME)) if CORPUS_STORE else None
     categories = [d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d))]
 
+    tasks = []
+    keys = set()
+    skipped = 0
     for category in categories:
         input_folder = os.path.join(data_dir, category)
-        output_folder = os.path.join(output_dir, category)
-        os.makedirs(output_folder, exist_ok=True)
-
-        print(f"正在处理科目：{category}")
-        count = 0
+        if store is None:
+            os.makedirs(os.path.join(output_dir, category), exist_ok=True)
         for filename in os.listdir(input_folder):
             file_path = os.path.join(input_folder, filename)
-            content = extract_content(file_path)
-            cleaned = clean_text(content)
-            if cleaned and len(cleaned) >= 30:
-                out_file = os.path.join(output_folder, f"{os.path.splitext(filename)[0]}.txt")
-                with open(out_file, "w", encoding="utf-8", errors="ignore") as f:
-                    f.write(cleaned)
-                count += 1
+            if not os.path.isfile(file_path):
+                continue
+            key = f"{category}/{filename}"
+            keys.add(key)
+            entry = manifest.get(key)
+            if is_up_to_date(entry, file_path, output_dir) \
+                    and (store is None or not entry["out"] or key in store):
+                skipped += 1
+                continue
+            if store is not None:
+                rel_out = corpus_store.STORE_NAME
+            else:
+                rel_out = os.path.join(category, f"{os.path.splitext(filename)[0]}.txt")
+            tasks.append((key, file_path, rel_out))
+
+    total = len(tasks)
+    print(f"共 {total + skipped} 个文件，{skipped} 个已是最新，待处理 {total} 个")
+    if not total:
+        if store is not None:
+            finish_store(store, keys)
+        return
+
+    workers = workers or config.get("EXTRACT_WORKERS", 0) or os.cpu_count() or 1
+    extracted = 0
+    done = 0
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = {executor.submit(extract_one, file_path, output_dir, rel_out): (key, file_path)
+                   for key, file_path, rel_out in tasks}
+        for future in as_completed(futures):
+            key, file_path = futures[future]
+            done += 1
+            try:
+                entry, text = future.result()
+            except Exception as e:
+                print(f"提取失败：{file_path} - {e}")
+                continue
+            manifest[key] = entry
+            if entry["out"]:
+                extracted += 1
+                if store is not None:
+                    store.append(key.split("/", 1)[0], key, entry["hash"], EXTRACT_VERSION, text)
             else:
+                if store is not None:
+                    store.remove(key)
                 print(f"跳过无效文件或内容太少：{file_path}")
-        print(f"已提取 {count} 个文件到 {output_folder}")
+
+            if done % MANIFEST_SAVE_EVERY == 0 or done == total:
+                save_manifest(output_dir, manifest)
+                elapsed = time.monotonic() - started
+                eta = elapsed / done * (total - done)
+                print(f"进度 {done}/{total}（{done * 100 // total}%），已用 {elapsed:.0f}s，预计剩余 {eta:.0f}s")
+
+    save_manifest(output_dir, manifest)
+    if store is not None:
+        finish_store(store, keys)
+        print(f"已提取 {extracted} 个文件到 {store.path}（共 {len(store)} 个文档）")
+    else:
+        print(f"已提取 {extracted} 个文件到 {output_dir}")
+
+
+def finish_store(store, keys):
+    """删除源文件已不存在的记录，覆盖的旧记录过多时压缩语料库"""
+    for key in store.sources() - keys:
+        store.remove(key)
+    if store.garbage_ratio() > STORE_COMPACT_RATIO:
+        saved = store.compact()
+        print(f"语料库已压缩，释放 {saved / 1024 / 1024:.1f}MB")
+    store.close()
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     data_dir = input("请输入训练数据根目录（如 train_data）: ").strip()
     output_dir = input("请输入输出目录（如 extracted_texts）: ").strip()
     process_folder(data_dir, output_dir)
\ No newline at end of file
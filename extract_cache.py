@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import logging
+
+# ==================== 配置参数 ====================
+CONFIG_FILE = "config.json"
+try:
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        config = json.load(f)
+except FileNotFoundError:
+    config = {}
+
+CACHE_FILE = config.get("EXTRACT_CACHE_FILE", "extract_cache.db")
+CACHE_MAX_MB = config.get("EXTRACT_CACHE_MAX_MB", 200)
+CACHE_ENABLED = config.get("EXTRACT_CACHE", True)
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def _connect():
+    """每个线程一个连接；WAL 模式下监视进程、extract.py 的多个进程可同时读写"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(CACHE_FILE, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS extracts (
+                            key TEXT PRIMARY KEY,
+                            text TEXT NOT NULL,
+                            size INTEGER NOT NULL,
+                            last_access REAL NOT NULL)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON extracts(last_access)")
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+
+# ==================== 内容指纹 ====================
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+
+def fingerprint(file_path):
+    """文件内容的 BLAKE2b 指纹，与文件名、路径无关；同一进程内按 (路径, 大小, 修改时间) 记忆"""
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _fingerprints_lock:
+        if memo_key in _fingerprints:
+            return _fingerprints[memo_key]
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    value = digest.hexdigest()
+
+    with _fingerprints_lock:
+        _fingerprints[memo_key] = value
+    return value
+
+
+# ==================== 读写 ====================
+def get(key):
+    conn = _connect()
+    row = conn.execute("SELECT text FROM extracts WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        return None
+    conn.execute("UPDATE extracts SET last_access = ? WHERE key = ?", (time.time(), key))
+    conn.commit()
+    return row[0]
+
+
+def put(key, text):
+    conn = _connect()
+    conn.execute("INSERT OR REPLACE INTO extracts (key, text, size, last_access) VALUES (?, ?, ?, ?)",
+                 (key, text, len(text.encode('utf-8')), time.time()))
+    conn.commit()
+    evict()
+
+
+def evict(max_bytes=None):
+    """总大小超过上限时按最近访问时间淘汰，腾出到上限的 90%"""
+    if max_bytes is None:
+        max_bytes = CACHE_MAX_MB * 1024 * 1024
+    conn = _connect()
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM extracts").fetchone()[0]
+    if total <= max_bytes:
+        return
+    target = max_bytes * 0.9
+    removed = 0
+    for key, size in conn.execute("SELECT key, size FROM extracts ORDER BY last_access").fetchall():
+        if total <= target:
+            break
+        conn.execute("DELETE FROM extracts WHERE key = ?", (key,))
+        total -= size
+        removed += 1
+    conn.commit()
+    logger.info(f"提取缓存淘汰 {removed} 条记录")
+
+
+def cached_extract(file_path, extract_fn, version):
+    """按 内容指纹 + 提取器版本 缓存 extract_fn(file_path) 的结果
+
+    version 需要区分提取逻辑和预算设置，提取方式变化时缓存自然失效。
+    空结果不缓存，以免把复制中途等临时失败固定下来；
+    超过时间预算而中途停止的结果（truncated 为真）也不缓存，下次重新提取。
+    """
+    if not CACHE_ENABLED:
+        return extract_fn(file_path)
+    try:
+        key = f"{fingerprint(file_path)}:{version}"
+        text = get(key)
+    except (OSError, sqlite3.Error) as e:
+        logger.info(f"提取缓存不可用: {file_path} - {e}")
+        return extract_fn(file_path)
+
+    if text is not None:
+        logger.info(f"提取缓存命中: {os.path.basename(file_path)}")
+        return text
+
+    text = extract_fn(file_path)
+    if getattr(text, "truncated", False):
+        logger.info(f"提取结果不完整，不写入缓存: {os.path.basename(file_path)}")
+    elif text and text.strip():
+        try:
+            put(key, text)
+        except sqlite3.Error as e:
+            logger.info(f"提取缓存写入失败: {file_path} - {e}")
+    return text
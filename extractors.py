@@ -0,0 +1,256 @@
+import os
+import time
+import json
+import logging
+import itertools
+import fitz  # PyMuPDF
+import ocr_engine
+import ooxml
+import video_extract
+
+# ==================== 配置参数 ====================
+CONFIG_FILE = "config.json"
+try:
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        config = json.load(f)
+except FileNotFoundError:
+    config = {}
+
+# 原生文本少于该字数的 PDF 页视为图片页，需要 OCR
+PDF_PAGE_MIN_CHARS = config.get("PDF_PAGE_MIN_CHARS", 20)
+
+# DOCX / PPTX 原生文本少于该字数时（达不到分类要求），OCR 其中嵌入的图片
+EMBEDDED_OCR_MIN_TEXT = config.get("EMBEDDED_OCR_MIN_TEXT", 30)
+EMBEDDED_OCR_MAX_IMAGES = config.get("EMBEDDED_OCR_MAX_IMAGES", 20)
+EMBEDDED_OCR_TIME_LIMIT = config.get("EMBEDDED_OCR_TIME_LIMIT", 30)
+
+# 提取逻辑变化时递增，使提取缓存中的旧结果失效
+EXTRACTOR_VERSION = 6
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== 预算 ====================
+class Budget:
+    """提取预算：字数、页数（PDF 页 / 幻灯片）和耗时，任一用完即停止"""
+
+    def __init__(self, max_chars=None, max_pages=None, time_limit=None):
+        self.max_chars = max_chars
+        self.max_pages = max_pages
+        self.time_limit = time_limit
+        self.chars = 0
+        self.started = time.monotonic()
+
+    def remaining_chars(self):
+        if self.max_chars is None:
+            return None
+        return max(0, self.max_chars - self.chars)
+
+    def remaining_time(self):
+        if self.time_limit is None:
+            return None
+        return max(0.0, self.time_limit - (time.monotonic() - self.started))
+
+    def consume(self, text):
+        self.chars += len(text.strip())
+
+    def exhausted(self):
+        """字数或耗时是否用完；页数预算由各格式的迭代器自行控制"""
+        if self.max_chars is not None and self.chars >= self.max_chars:
+            return True
+        if self.time_limit is not None and time.monotonic() - self.started >= self.time_limit:
+            return True
+        return False
+
+    def timed_out(self):
+        """字数还没够、耗时却已用完：结果取决于机器快慢，不能当作完整结果"""
+        if self.max_chars is not None and self.chars >= self.max_chars:
+            return False
+        return self.time_limit is not None and self.remaining_time() == 0
+
+
+class TruncatedText(str):
+    """因超过时间预算中途停止的提取结果，提取缓存不保存这类结果"""
+    truncated = True
+
+
+def select_pages(page_count, max_pages=None, sample=False):
+    """选择要读取的页码
+
+    不采样时取前 max_pages 页；采样时取前一半预算的连续页（封面、目录、第一章），
+    其余预算在剩余页中均匀分布，适合几百页的教材。
+    """
+    if max_pages is None or page_count <= max_pages:
+        return list(range(page_count))
+    if not sample:
+        return list(range(max_pages))
+
+    head = max(1, max_pages // 2)
+    rest = max_pages - head
+    pages = list(range(head))
+    if rest > 0:
+        step = (page_count - head) / rest
+        pages.extend(head + int(step * i + step / 2) for i in range(rest))
+    return pages
+
+
+# ==================== 流式提取 ====================
+def ocr_embedded_images(file_path, min_chars=None, time_limit=EMBEDDED_OCR_TIME_LIMIT):
+    """OCR DOCX / PPTX 中嵌入的图片（截图贴成的课件），最多 EMBEDDED_OCR_MAX_IMAGES 张"""
+    started = time.monotonic()
+    blobs = list(itertools.islice(ooxml.iter_images(file_path), EMBEDDED_OCR_MAX_IMAGES))
+    texts = ocr_engine.ocr_images(blobs, min_chars=min_chars, time_limit=time_limit)
+    done = sum(1 for text in texts if text.strip())
+    logger.info(f"嵌入图片OCR {os.path.basename(file_path)}：{len(blobs)}张（已去重），"
+                f"{done}张识别出文字，耗时{time.monotonic() - started:.1f}s")
+    return [text for text in texts if text.strip()]
+
+
+def _iter_with_embedded_ocr(file_path, chunks, budget, ocr):
+    """先产出原生文本；总字数达不到分类要求时再产出嵌入图片的 OCR 结果"""
+    chars = 0
+    for text in chunks:
+        chars += len(text.strip())
+        yield text
+    if not ocr or chars >= EMBEDDED_OCR_MIN_TEXT:
+        return
+
+    time_limit = EMBEDDED_OCR_TIME_LIMIT
+    min_chars = None
+    if budget:
+        remaining = budget.remaining_time()
+        if remaining is not None:
+            time_limit = min(time_limit, remaining)
+        min_chars = budget.remaining_chars()
+    for text in ocr_embedded_images(file_path, min_chars, time_limit):
+        yield text
+
+
+def iter_docx(file_path, budget=None, ocr=True):
+    """逐段落产出 DOCX 文本（含表格、脚注），正文过少时补充嵌入图片 OCR"""
+    paragraphs = (text for text in ooxml.iter_docx_paragraphs(file_path) if text.strip())
+    return _iter_with_embedded_ocr(file_path, paragraphs, budget, ocr)
+
+
+def iter_pptx(file_path, budget=None, ocr=True):
+    """逐张幻灯片产出 PPTX 文本（含组合形状、表格、备注），文字过少时补充图片 OCR"""
+    max_pages = budget.max_pages if budget else None
+    slides = itertools.islice(ooxml.iter_pptx_slides(file_path), max_pages)
+    return _iter_with_embedded_ocr(file_path, slides, budget, ocr)
+
+
+def iter_pdf(file_path, budget=None, sample=False, ocr=True):
+    """逐页混合提取：原生文本足够的页直接使用，纯图片或几乎为空的页才渲染 OCR
+
+    原生文本页按页序逐页产出，调用方的字数或时间预算用完即不再读取后面的页；
+    遇到第一张需要 OCR 的页后，才读取其余页的原生文本，图片页在剩余预算内并行识别，
+    再按页序与原生文本合并产出。每页的提取方式记录在日志中。
+    """
+    max_pages = budget.max_pages if budget else None
+    started = time.monotonic()
+    stats = {}
+    with ocr_engine.fitz_lock:
+        doc = fitz.open(file_path)
+    try:
+        pages = select_pages(len(doc), max_pages, sample)
+        rest = []
+        for i, page_num in enumerate(pages):
+            with ocr_engine.fitz_lock:
+                text = doc.load_page(page_num).get_text()
+            chars = len(text.strip())
+            if ocr and chars < PDF_PAGE_MIN_CHARS:
+                rest = pages[i:]
+                break
+            stats[page_num] = f"原生{chars}字"
+            yield text
+
+        texts = {}
+        ocr_needed = []
+        native_chars = 0
+        with ocr_engine.fitz_lock:
+            for page_num in rest:
+                text = doc.load_page(page_num).get_text()
+                chars = len(text.strip())
+                if chars >= PDF_PAGE_MIN_CHARS:
+                    texts[page_num] = text
+                    stats[page_num] = f"原生{chars}字"
+                    native_chars += chars
+                else:
+                    ocr_needed.append(page_num)
+
+        min_chars = None
+        time_limit = None
+        if budget:
+            remaining = budget.remaining_chars()
+            if remaining is not None:
+                min_chars = remaining - native_chars
+            time_limit = budget.remaining_time()
+        if ocr_needed and ((min_chars is not None and min_chars <= 0) or time_limit == 0):
+            # 原生文本已经够用或时间用完，剩下的图片页不必再 OCR
+            for page_num in ocr_needed:
+                stats[page_num] = "跳过OCR"
+            ocr_needed = []
+
+        if ocr_needed:
+            results = ocr_engine.ocr_pages(file_path, ocr_needed, min_chars=min_chars, time_limit=time_limit)
+            for page_num in ocr_needed:
+                if page_num in results:
+                    texts[page_num] = results[page_num]
+                    stats[page_num] = f"OCR{len(results[page_num].strip())}字"
+                else:
+                    stats[page_num] = "取消OCR"
+
+        for page_num in rest:
+            if page_num in texts:
+                yield texts[page_num]
+    finally:
+        with ocr_engine.fitz_lock:
+            doc.close()
+        native_count = sum(1 for v in stats.values() if v.startswith("原生"))
+        ocr_count = sum(1 for v in stats.values() if v.startswith("OCR"))
+        detail = " ".join(f"P{n + 1}:{stats[n]}" for n in sorted(stats))
+        logger.info(f"PDF逐页提取 {os.path.basename(file_path)}：读取{len(stats)}页，原生{native_count}页，"
+                    f"OCR{ocr_count}页，耗时{time.monotonic() - started:.1f}s | {detail}")
+
+
+def iter_mp4(file_path, budget=None, ocr=True):
+    """视频：容器元数据 + 少量关键帧 OCR，耗时取 VIDEO_TIME_LIMIT 与剩余预算中较小者"""
+    time_limit = video_extract.VIDEO_TIME_LIMIT
+    remaining = budget.remaining_time() if budget else None
+    if remaining is not None:
+        time_limit = min(time_limit, remaining)
+    return video_extract.iter_mp4(file_path, time_limit, ocr)
+
+
+def iter_content(file_path, budget=None, sample=False, ocr=True):
+    """按文件类型逐块产出文本（段落 / 幻灯片 / 页）"""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".docx":
+        return iter_docx(file_path, budget, ocr)
+    elif ext == ".pptx":
+        return iter_pptx(file_path, budget, ocr)
+    elif ext == ".pdf":
+        return iter_pdf(file_path, budget, sample, ocr)
+    elif ext == ".mp4":
+        return iter_mp4(file_path, budget, ocr)
+    return iter(())
+
+
+def extract_budgeted(file_path, max_chars=None, max_pages=None, time_limit=None,
+                     sample=False, ocr=True):
+    """在预算内提取文本，证据足够即停止解析；不设预算时等同于完整提取"""
+    budget = Budget(max_chars, max_pages, time_limit)
+    chunks = []
+    try:
+        for text in iter_content(file_path, budget, sample, ocr):
+            chunks.append(text)
+            budget.consume(text)
+            if budget.exhausted():
+                break
+    except Exception as e:
+        logger.info(f"内容提取失败: {file_path} - {e}")
+    text = '\n'.join(chunks)
+    if budget.timed_out():
+        logger.info(f"提取超过时间预算 {time_limit}s，结果不完整: {os.path.basename(file_path)}")
+        return TruncatedText(text)
+    return text
@@ -10,11 +10,11 @@ from plyer import notification
 import joblib
 import docx
 import pptx
-import fitz  # PyMuPDF
 import pytesseract
-from PIL import Image
 import cv2
-import tempfile
+import extractors
+import keyword_matcher
+from model_input import model_text
 from collections import defaultdict
 
 # ==================== 配置参数 ====================
@@ -22,6 +22,10 @@ WATCH_FOLDER = os.path.expanduser("D:\定期练手\自动归纳\monitor")  # 默
 OUTPUT_BASE_FOLDER = os.path.expanduser("D:\定期练手\自动归纳\monitor")  # 归类根目录
 SUPPORTED_EXTS = ['.docx', '.pdf', '.pptx', '.wps', '.mp4', '.wbd']  # 支持的文件类型
 DELAY_SECONDS = 3  # 延迟识别时间（秒）
+# 文件名 + U盘标签得分领先第二名至少这么多分时不再提取内容；
+# 正文最多再加 3 分（模型 2 分 + 正文关键词 1 分），所以 4 与总是提取内容的结果完全一致，
+# 调小可以少读一些文件，但正文本可以扭转的结果会被文件名决定
+DECISIVE_MARGIN = 4
 
 # 设置 Tesseract 路径
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
@@ -91,15 +95,8 @@ def extract_pptx(file_path):
 
 
 def extract_pdf(file_path):
-    try:
-        doc = fitz.open(file_path)
-        text = '\n'.join(page.get_text() for page in doc)
-        if not text.strip():
-            raise ValueError("PDF无文本内容，尝试OCR")
-        return text
-    except Exception as e:
-        print(f"PDF原生提取失败，尝试OCR：{file_path} - {e}")
-        return ocr_pdf(file_path)
+    """逐页混合提取：有文本的页用原生文本，图片页才 OCR"""
+    return extractors.extract_budgeted(file_path)
 
 
 def extract_wbd(file_path):
@@ -120,27 +117,6 @@ def ocr_image(image_path):
         return ""
 
 
-def ocr_pdf(pdf_path):
-    """将 PDF 转为图像后 OCR 提取文本"""
-    try:
-        doc = fitz.open(pdf_path)
-        temp_dir = tempfile.mkdtemp()
-        texts = []
-
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            pix = page.get_pixmap(dpi=200)
-            img_path = os.path.join(temp_dir, f"page_{page_num}.png")
-            pix.save(img_path)
-            texts.append(ocr_image(img_path))
-
-        shutil.rmtree(temp_dir)
-        return '\n'.join(texts)
-    except Exception as e:
-        print(f"OCR转换失败: {pdf_path} - {e}")
-        return ""
-
-
 # ==================== 加载模型 ====================
 try:
     clf = joblib.load("subject_classifier.pkl")
@@ -154,26 +130,36 @@ except Exception as e:
 def classify_file(file_path):
     filename = os.path.basename(file_path)
     usb_label = get_usb_label(file_path)
-    content = extract_content(file_path)
 
     scores = defaultdict(int)
 
     # 文件名匹配
-    for subject, keywords in SUBJECT_KEYWORDS.items():
-        for keyword in keywords:
-            if re.search(keyword, filename, re.IGNORECASE):
-                scores[subject] += 1
+    matcher = keyword_matcher.get_matcher(SUBJECT_KEYWORDS)
+    for subject, score in matcher.scores(filename).items():
+        scores[subject] += score
 
     # U盘标签匹配（优先级最高）
     if usb_label in USB_LABEL_MAP:
         scores[USB_LABEL_MAP[usb_label]] += 3
 
+    # 文件名和U盘标签已足够确定时不再读取文件内容
+    ranked = sorted(scores.values(), reverse=True) + [0, 0]
+    if ranked[0] > 0 and ranked[0] - ranked[1] >= DECISIVE_MARGIN:
+        return max(scores, key=scores.get)
+
     # 内容匹配
+    content = extract_content(file_path)
     if content and len(content) > 30:
-        X = vectorizer.transform([content])
+        X = vectorizer.transform([model_text(file_path, content)])
         ai_subject = clf.predict(X)[0]
         scores[ai_subject] += 2
 
+    # 正文关键词匹配：命中关键词最多的学科
+    if content:
+        keyword_subject = matcher.best(content)
+        if keyword_subject:
+            scores[keyword_subject] += 1
+
     # 决策逻辑
     if scores:
         max_score = max(scores.values())
@@ -4,23 +4,20 @@ import time
 import re
 import shutil
 import threading
-from collections import defaultdict
 import json
 import logging
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from PIL import Image, ImageDraw
 from pystray import Icon as icon, Menu as menu, MenuItem as item
-import joblib
-import docx
-import pptx
-import fitz  # PyMuPDF
-import pytesseract
-import cv2
-import tempfile
+import lazy_loader
+import multiprocessing
+import keyword_matcher
+from model_input import model_text
+import cascade
+import extract_cache
+import sandbox
 import subprocess
-import winrt.windows.ui.notifications as notifications
-import winrt.windows.data.xml.dom as dom
 
 # ==================== 配置参数 ====================
 CONFIG_FILE = "config.json"
@@ -37,8 +34,15 @@ OUTPUT_BASE_FOLDER = config["OUTPUT_BASE_FOLDER"]
 print('[移动文件夹]:', OUTPUT_BASE_FOLDER)
 SUPPORTED_EXTS = config["SUPPORTED_EXTS"]
 DELAY_SECONDS = config.get("DELAY_SECONDS", 3)
-
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+EXTRACT_MAX_CHARS = config.get("EXTRACT_MAX_CHARS", 1000)
+EXTRACT_MAX_PAGES = config.get("EXTRACT_MAX_PAGES", 30)
+EXTRACT_TIME_LIMIT = config.get("EXTRACT_TIME_LIMIT", 60)
+EXTRACT_SAMPLE_PAGES = config.get("EXTRACT_SAMPLE_PAGES", True)
+COMPACT_MODEL = config.get("COMPACT_MODEL", True)
+# 托盘图标先出现，提取模块和模型在后台预热；关闭时启动前全部加载完毕
+FAST_START = config.get("FAST_START", True)
+# 文件名 -> 开头原生文本 -> 完整原生文本 -> OCR，置信度够高即停止
+CASCADE = config.get("CASCADE", True)
 
 # 学科关键词映射表
 SUBJECT_KEYWORDS = {
@@ -65,87 +69,43 @@ def ensure_folder_exists(folder):
 
 
 # ==================== 提取内容函数 ====================
-def extract_docx(file_path):
-    try:
-        doc = docx.Document(file_path)
-        return '\n'.join(para.text for para in doc.paragraphs)
-    except Exception as e:
-        log(f"DOCX提取失败: {file_path} - {e}")
-        return None
-
-
-def extract_pptx(file_path):
-    try:
-        pres = pptx.Presentation(file_path)
-        return '\n'.join(shape.text for slide in pres.slides
-                         for shape in slide.shapes if hasattr(shape, "text"))
-    except Exception as e:
-        log(f"PPTX提取失败: {file_path} - {e}")
-        return None
-
-
-def extract_pdf(file_path):
-    try:
-        doc = fitz.open(file_path)
-        text = '\n'.join(page.get_text() for page in doc)
-        if not text.strip():
-            raise ValueError("PDF无文本内容，尝试OCR")
-        return text
-    except Exception as e:
-        log(f"PDF原生提取失败，尝试OCR：{file_path} - {e}")
-        return ocr_pdf(file_path)
+def extract_budgeted(file_path):
+    """在预算内流式提取，够分类用即停止，超大 PDF 按页抽样
 
+    开启 SANDBOX_EXTRACT 时在隔离的工作进程中执行，超时或内存超限的文件记为失败，
+    只按文件名判断。
+    """
+    return extract_with_budget(
+        file_path,
+        max_chars=EXTRACT_MAX_CHARS,
+        max_pages=EXTRACT_MAX_PAGES,
+        time_limit=EXTRACT_TIME_LIMIT,
+        sample=EXTRACT_SAMPLE_PAGES,
+    )
 
-def ocr_image(image_path):
-    try:
-        img = cv2.imread(image_path)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        _, binary = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
-        text = pytesseract.image_to_string(binary, lang='chi_sim')
-        return text
-    except Exception as e:
-        log(f"OCR识别失败: {image_path} - {e}")
-        return ""
 
-
-def ocr_pdf(pdf_path):
-    try:
-        doc = fitz.open(pdf_path)
-        temp_dir = tempfile.mkdtemp()
-        texts = []
-
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            pix = page.get_pixmap(dpi=200)
-            img_path = os.path.join(temp_dir, f"page_{page_num}.png")
-            pix.save(img_path)
-            texts.append(ocr_image(img_path))
-
-        shutil.rmtree(temp_dir)
-        return '\n'.join(texts)
-    except Exception as e:
-        log(f"OCR转换失败: {pdf_path} - {e}")
-        return ""
+def extract_with_budget(file_path, **budget):
+    """按给定预算提取，预算参数同 extractors.extract_budgeted"""
+    if sandbox.SANDBOX_ENABLED:
+        return sandbox.extract(file_path, **budget)
+    import extractors
+    return extractors.extract_budgeted(file_path, **budget)
 
 
 def extract_content(file_path):
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext == ".docx":
-        return extract_docx(file_path)
-    elif ext == ".pptx":
-        return extract_pptx(file_path)
-    elif ext == ".pdf":
-        return extract_pdf(file_path)
-    else:
-        return ""
+    """重复拖入的相同内容直接读取缓存，不再重新解析和 OCR"""
+    import extractors
+    # 超过时间预算时只提取了一部分，预算不同的结果不能混用
+    version = (f"extractors-{extractors.EXTRACTOR_VERSION}:"
+               f"{EXTRACT_MAX_CHARS}/{EXTRACT_MAX_PAGES}/{EXTRACT_TIME_LIMIT}/{int(EXTRACT_SAMPLE_PAGES)}")
+    return extract_cache.cached_extract(file_path, extract_budgeted, version)
 
 
 # ==================== 加载模型 ====================
-try:
-    clf = joblib.load("subject_classifier.pkl")
-    vectorizer = joblib.load("tfidf_vectorizer.pkl")
-except Exception as e:
-    print("⚠️ 模型文件未找到，请先运行训练脚本！", e)
+# 第一次分类时才真正加载（或由启动后的后台预热加载），这里只检查文件是否存在
+model = lazy_loader.LazyModel(COMPACT_MODEL)
+if not model.available():
+    print("⚠️ 模型文件未找到，请先运行训练脚本！")
     exit(1)
 
 
@@ -153,23 +113,17 @@ except Exception as e:
 def guess_by_filename(filename):
     filename_base = os.path.splitext(os.path.basename(filename))[0]
     filename_base = clean_text(filename_base)
-    scores = defaultdict(int)
-
-    for subject, keywords in SUBJECT_KEYWORDS.items():
-        for keyword in keywords:
-            if re.search(keyword, filename_base, re.IGNORECASE):
-                scores[subject] += 1
-
-    if not scores:
-        return None
-
-    max_score = max(scores.values())
-    candidates = [k for k, v in scores.items() if v == max_score]
-    return candidates[0] if len(candidates) == 1 else None
+    return keyword_matcher.get_matcher(SUBJECT_KEYWORDS).best(filename_base)
 
 
 # ==================== 主分类逻辑（先文件名后内容）====================
 def classify_file(file_path):
+    if CASCADE:
+        result = classifier_cascade.classify(file_path)
+        log_result(result)
+        keep_result(result)
+        return result["subject"]
+
     subject = guess_by_filename(file_path)
     if subject:
         log(f"[文件名识别] 文件 {os.path.basename(file_path)} 分类为：{subject}")
@@ -177,14 +131,62 @@ def classify_file(file_path):
 
     content = extract_content(file_path)
     if content and len(content.strip()) >= 30:
-        X = vectorizer.transform([content])
+        clf, vectorizer = model.get()
+        X = vectorizer.transform([model_text(file_path, content)])
         ai_subject = clf.predict(X)[0]
         log(f"[AI模型识别] 文件 {os.path.basename(file_path)} 分类为：{ai_subject}")
         return ai_subject
 
+    # 正文太短不足以交给模型时，用正文中的学科关键词判断
+    if content:
+        keyword_subject = keyword_matcher.get_matcher(SUBJECT_KEYWORDS).best(content)
+        if keyword_subject:
+            log(f"[正文关键词识别] 文件 {os.path.basename(file_path)} 分类为：{keyword_subject}")
+            return keyword_subject
+
     return None
 
 
+def guess_by_content_keywords(content):
+    return keyword_matcher.get_matcher(SUBJECT_KEYWORDS).best(content)
+
+
+classifier_cascade = cascade.Cascade(model.get, guess_by_filename, guess_by_content_keywords,
+                                     extract_with_budget, extract_content)
+
+# 级联结果保留到用户确认之后，确认后才把文件加入近似重复索引
+pending_results = {}
+pending_results_lock = threading.Lock()
+
+
+def keep_result(result):
+    with pending_results_lock:
+        pending_results[result["path"]] = result
+
+
+def take_result(file_path):
+    with pending_results_lock:
+        return pending_results.pop(file_path, None)
+
+
+def update_near_dup(result, subject):
+    """subject 为用户确认的学科，否定时为 None"""
+    if result is not None and cascade.NEAR_DUP:
+        classifier_cascade.remember(result, subject)
+
+RESULT_LABELS = {"filename": "文件名识别", "keywords": "正文关键词识别",
+                 "head": "开头原生文本识别", "native": "原生文本识别", "ocr": "OCR识别",
+                 "near_dup": "近似重复识别"}
+
+
+def log_result(result):
+    if result["subject"] is None:
+        return
+    confidence = f"，置信度 {result['confidence']:.2f}" if result["confidence"] is not None else ""
+    log(f"[{RESULT_LABELS[result['source']]}] 文件 {os.path.basename(result['path'])} "
+        f"分类为：{result['subject']}{confidence}（耗时 {sum(result['timings'].values()):.2f}s）")
+
+
 # ==================== 日志模块 ====================
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -211,6 +213,8 @@ def save_result(result):
         file.write(result)
 
 def send_toast(subject, file_path):
+    import winrt.windows.ui.notifications as notifications
+    import winrt.windows.data.xml.dom  # 返回的 XmlDocument 需要该命名空间的投影
     message = f"文件 {os.path.basename(file_path)} 分类为：{subject}\n是否正确？（请在5s内判断）\n如果正确请不要理睬此消息，或关闭\n如果错误，请点击此消息，文件会自动移回"
 
     # 创建 XML 模板
@@ -271,6 +275,7 @@ class FileHandler(FileSystemEventHandler):
             return
 
         subject = classify_file(file_path)
+        result = take_result(file_path)
         filename = os.path.basename(file_path)
 
         if subject:
@@ -281,7 +286,10 @@ class FileHandler(FileSystemEventHandler):
                 # 发送通知并等待用户反馈
                 if not self.handle_user_feedback(subject, file_path):
                     log(f"用户标记为误判")
+                    take_result(file_path)  # move_back 重新分类时保留的结果
+                    update_near_dup(result, None)
                 else:
+                    update_near_dup(result, subject)
                     shutil.move(file_path, dest_path)
                     log(f"文件 {filename} 分类为：{subject}，已归类到 {dest_folder}/")
                     try:
@@ -343,8 +351,12 @@ def move_back(file_path):
         pass
 
 # ==================== 启动后台监控 ====================
+watcher = None
+
+
 def start_file_watcher():
-    observer = Observer()
+    global watcher
+    observer = watcher = Observer()
     observer.schedule(FileHandler(), path=config["WATCH_FOLDER"], recursive=False)
     observer.start()
 
@@ -399,12 +411,22 @@ def open_config(icon, item):
 
 
 def exit_app(icon, item):
+    # 与 file_classifier_canary.py 相同：先停止监控，再关闭提取工作进程和 OCR 进程池，os._exit 不会替我们清理
+    if watcher is not None:
+        watcher.stop()
+    sandbox.shutdown()
+    if "ocr_engine" in sys.modules:
+        # 只有加载过提取模块时才有 OCR 进程池需要关闭
+        sys.modules["ocr_engine"].shutdown()
     icon.stop()
     os._exit(0)
 
 
 # ==================== 主程序入口 ====================
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    if not FAST_START:
+        lazy_loader.warm_up(model, ["extractors"]).join()
     from pystray import Icon as icon, Menu as menu, MenuItem as item
 
     watcher_thread = threading.Thread(target=start_file_watcher, daemon=True)
@@ -423,4 +445,6 @@ if __name__ == "__main__":
         pass
 
     log("AI课件分类器已启动，常驻系统托盘中...")
+    if FAST_START:
+        lazy_loader.warm_up(model, ["extractors"])
     tray_icon.run()
\ No newline at end of file
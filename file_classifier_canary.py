@@ -10,25 +10,22 @@ import time
 import re
 import shutil
 import threading
-from collections import defaultdict
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from PIL import Image
 from pystray import Icon as icon, Menu as menu, MenuItem as item
-import joblib
-import docx
-import pptx
-import fitz  # PyMuPDF
-import pytesseract
-import cv2
-import tempfile
+import lazy_loader
+import multiprocessing
+import keyword_matcher
+from model_input import model_text
+import cascade
+import batch_classify
+import extract_cache
+import sandbox
 import subprocess
-import winrt.windows.ui.notifications as notifications
-import winrt.windows.data.xml.dom as dom
-import tkinter as tk
-from tkinter import messagebox
 
 # ==================== 配置参数 ====================
 CONFIG_FILE = "config.json"
@@ -43,8 +40,19 @@ WATCH_FOLDER = config["WATCH_FOLDER"]
 OUTPUT_BASE_FOLDER = config["OUTPUT_BASE_FOLDER"]
 SUPPORTED_EXTS = config["SUPPORTED_EXTS"]
 DELAY_SECONDS = config.get("DELAY_SECONDS", 3)
-
-pytesseract.pytesseract.tesseract_cmd = config["TESSERACT_PATH"]
+EXTRACT_MAX_CHARS = config.get("EXTRACT_MAX_CHARS", 1000)
+EXTRACT_MAX_PAGES = config.get("EXTRACT_MAX_PAGES", 30)
+EXTRACT_TIME_LIMIT = config.get("EXTRACT_TIME_LIMIT", 60)
+EXTRACT_SAMPLE_PAGES = config.get("EXTRACT_SAMPLE_PAGES", True)
+COMPACT_MODEL = config.get("COMPACT_MODEL", True)
+# 托盘图标先出现，提取模块和模型在后台预热；关闭时启动前全部加载完毕
+FAST_START = config.get("FAST_START", True)
+# 文件名 -> 开头原生文本 -> 完整原生文本 -> OCR，置信度够高即停止
+CASCADE = config.get("CASCADE", True)
+# 同时拷入多个文件时攒成一批，一次向量化、批量预测
+BATCH_CLASSIFY = config.get("BATCH_CLASSIFY", True)
+# 标记误判后让用户选择正确学科，记录下来并在后台增量更新模型
+ONLINE_LEARNING = config.get("ONLINE_LEARNING", True)
 
 # 学科关键词映射表
 SUBJECT_KEYWORDS = {
@@ -68,103 +76,56 @@ def ensure_folder_exists(folder):
         os.makedirs(folder)
 
 # ==================== 提取内容函数 ====================
-def extract_docx(file_path):
-    try:
-        doc = docx.Document(file_path)
-        return '\n'.join(para.text for para in doc.paragraphs)
-    except Exception as e:
-        log(f"DOCX提取失败: {file_path} - {e}")
-        return None
-
-def extract_pptx(file_path):
-    try:
-        pres = pptx.Presentation(file_path)
-        return '\n'.join(shape.text for slide in pres.slides
-                         for shape in slide.shapes if hasattr(shape, "text"))
-    except Exception as e:
-        log(f"PPTX提取失败: {file_path} - {e}")
-        return None
-
-def extract_pdf(file_path):
-    try:
-        doc = fitz.open(file_path)
-        text = '\n'.join(page.get_text() for page in doc)
-        if not text.strip():
-            raise ValueError("PDF无文本内容，尝试OCR")
-        return text
-    except Exception as e:
-        log(f"PDF原生提取失败，尝试OCR：{file_path} - {e}")
-        return ocr_pdf(file_path)
-
-def ocr_image(image_path):
-    try:
-        img = cv2.imread(image_path)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        _, binary = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
-        text = pytesseract.image_to_string(binary, lang='chi_sim')
-        return text
-    except Exception as e:
-        log(f"OCR识别失败: {image_path} - {e}")
-        return ""
-
-def ocr_pdf(pdf_path):
-    try:
-        doc = fitz.open(pdf_path)
-        temp_dir = tempfile.mkdtemp()
-        texts = []
-
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            pix = page.get_pixmap(dpi=200)
-            img_path = os.path.join(temp_dir, f"page_{page_num}.png")
-            pix.save(img_path)
-            texts.append(ocr_image(img_path))
-
-        shutil.rmtree(temp_dir)
-        return '\n'.join(texts)
-    except Exception as e:
-        log(f"OCR转换失败: {pdf_path} - {e}")
-        return ""
+def extract_budgeted(file_path):
+    """在预算内流式提取，够分类用即停止，超大 PDF 按页抽样
+
+    开启 SANDBOX_EXTRACT 时在隔离的工作进程中执行，超时或内存超限的文件记为失败，
+    只按文件名判断。
+    """
+    return extract_with_budget(
+        file_path,
+        max_chars=EXTRACT_MAX_CHARS,
+        max_pages=EXTRACT_MAX_PAGES,
+        time_limit=EXTRACT_TIME_LIMIT,
+        sample=EXTRACT_SAMPLE_PAGES,
+    )
+
+def extract_with_budget(file_path, **budget):
+    """按给定预算提取，预算参数同 extractors.extract_budgeted"""
+    if sandbox.SANDBOX_ENABLED:
+        return sandbox.extract(file_path, **budget)
+    import extractors
+    return extractors.extract_budgeted(file_path, **budget)
 
 def extract_content(file_path):
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext == ".docx":
-        return extract_docx(file_path)
-    elif ext == ".pptx":
-        return extract_pptx(file_path)
-    elif ext == ".pdf":
-        return extract_pdf(file_path)
-    else:
-        return ""
+    """重复拖入的相同内容直接读取缓存，不再重新解析和 OCR"""
+    import extractors
+    # 超过时间预算时只提取了一部分，预算不同的结果不能混用
+    version = (f"extractors-{extractors.EXTRACTOR_VERSION}:"
+               f"{EXTRACT_MAX_CHARS}/{EXTRACT_MAX_PAGES}/{EXTRACT_TIME_LIMIT}/{int(EXTRACT_SAMPLE_PAGES)}")
+    return extract_cache.cached_extract(file_path, extract_budgeted, version)
 
 # ==================== 加载模型 ====================
-try:
-    clf = joblib.load("subject_classifier.pkl")
-    vectorizer = joblib.load("tfidf_vectorizer.pkl")
-except Exception as e:
-    print("⚠️ 模型文件未找到，请先运行训练脚本！", e)
+# 第一次分类时才真正加载（或由启动后的后台预热加载），这里只检查文件是否存在
+model = lazy_loader.LazyModel(COMPACT_MODEL)
+if not model.available():
+    print("⚠️ 模型文件未找到，请先运行训练脚本！")
     sys.exit(1)
 
 # ==================== 文件名辅助判断 ====================
 def guess_by_filename(filename):
     filename_base = os.path.splitext(os.path.basename(filename))[0]
     filename_base = clean_text(filename_base)
-    scores = defaultdict(int)
-
-    for subject, keywords in SUBJECT_KEYWORDS.items():
-        for keyword in keywords:
-            if re.search(keyword, filename_base, re.IGNORECASE):
-                scores[subject] += 1
-
-    if not scores:
-        return None
-
-    max_score = max(scores.values())
-    candidates = [k for k, v in scores.items() if v == max_score]
-    return candidates[0] if len(candidates) == 1 else None
+    return keyword_matcher.get_matcher(SUBJECT_KEYWORDS).best(filename_base)
 
 # ==================== 主分类逻辑（先文件名后内容）====================
 def classify_file(file_path):
+    if CASCADE:
+        result = classifier_cascade.classify(file_path)
+        log_result(result)
+        keep_result(result)
+        return result["subject"]
+
     subject = guess_by_filename(file_path)
     if subject:
         log(f"[文件名识别] 文件 {os.path.basename(file_path)} 分类为：{subject}")
@@ -172,13 +133,71 @@ def classify_file(file_path):
 
     content = extract_content(file_path)
     if content and len(content.strip()) >= 30:
-        X = vectorizer.transform([content])
+        clf, vectorizer = model.get()
+        X = vectorizer.transform([model_text(file_path, content)])
         ai_subject = clf.predict(X)[0]
         log(f"[AI模型识别] 文件 {os.path.basename(file_path)} 分类为：{ai_subject}")
         return ai_subject
 
+    # 正文太短不足以交给模型时，用正文中的学科关键词判断
+    if content:
+        keyword_subject = keyword_matcher.get_matcher(SUBJECT_KEYWORDS).best(content)
+        if keyword_subject:
+            log(f"[正文关键词识别] 文件 {os.path.basename(file_path)} 分类为：{keyword_subject}")
+            return keyword_subject
+
     return None
 
+def classify_paths(paths):
+    """批量版 classify_file，返回 {路径: 学科或 None}"""
+    if CASCADE:
+        results = classifier_cascade.classify_many(paths)
+    else:
+        matcher = keyword_matcher.get_matcher(SUBJECT_KEYWORDS)
+        clf, vectorizer = model.get()
+        results = batch_classify.classify_many(paths, clf, vectorizer, extract_content,
+                                               guess_fn=guess_by_filename, keyword_fn=matcher.best)
+    for result in results:
+        log_result(result)
+        if CASCADE:
+            keep_result(result)
+    return {result["path"]: result["subject"] for result in results}
+
+def guess_by_content_keywords(content):
+    return keyword_matcher.get_matcher(SUBJECT_KEYWORDS).best(content)
+
+classifier_cascade = cascade.Cascade(model.get, guess_by_filename, guess_by_content_keywords,
+                                     extract_with_budget, extract_content)
+
+# 级联结果保留到用户确认之后，确认或纠正后才把文件加入近似重复索引
+pending_results = {}
+pending_results_lock = threading.Lock()
+
+def keep_result(result):
+    with pending_results_lock:
+        pending_results[result["path"]] = result
+
+def take_result(file_path):
+    with pending_results_lock:
+        return pending_results.pop(file_path, None)
+
+def update_near_dup(result, subject):
+    """subject 为用户确认或纠正后的学科，否定且没有给出正确学科时为 None"""
+    if result is not None and cascade.NEAR_DUP:
+        classifier_cascade.remember(result, subject)
+
+RESULT_LABELS = {"filename": "文件名识别", "model": "AI模型识别", "keywords": "正文关键词识别",
+                 "head": "开头原生文本识别", "native": "原生文本识别", "ocr": "OCR识别",
+                 "near_dup": "近似重复识别"}
+
+def log_result(result):
+    """记录一条分类结果（批量分类 / 级联共用）"""
+    if result["subject"] is None:
+        return
+    confidence = f"，置信度 {result['confidence']:.2f}" if result["confidence"] is not None else ""
+    log(f"[{RESULT_LABELS[result['source']]}] 文件 {os.path.basename(result['path'])} "
+        f"分类为：{result['subject']}{confidence}（耗时 {sum(result['timings'].values()):.2f}s）")
+
 # ==================== 日志模块 ====================
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -202,6 +221,8 @@ def save_result(result):
         file.write(result)
 
 def send_toast(subject, file_path):
+    import winrt.windows.ui.notifications as notifications
+    import winrt.windows.data.xml.dom  # 返回的 XmlDocument 需要该命名空间的投影
     if file_path == "STARTUP":
         title = "AI课件分类器已启动"
         message = f"开始监视文件夹: {WATCH_FOLDER}\n文件将分类到: {OUTPUT_BASE_FOLDER}"
@@ -230,6 +251,8 @@ def send_toast(subject, file_path):
 class FileHandler(FileSystemEventHandler):
     def __init__(self):
         self.running = True
+        self.batcher = (batch_classify.MicroBatcher(self.classify_batch, DELAY_SECONDS, on_failure=self.release)
+                        if BATCH_CLASSIFY else None)
 
     def on_created(self, event):
         if not self.running or event.is_directory:
@@ -247,28 +270,53 @@ class FileHandler(FileSystemEventHandler):
                 return
             processed_files.add(file_path)
 
-        threading.Thread(target=self.delayed_classification, args=(file_path,), daemon=True).start()
-
-    def delayed_classification(self, file_path):
-        log(f"等待 {DELAY_SECONDS} 秒后尝试识别文件：{file_path}")
-        time.sleep(DELAY_SECONDS)
+        if self.batcher is not None:
+            log(f"等待 {DELAY_SECONDS} 秒后批量识别文件：{file_path}")
+            self.batcher.add(file_path)
+        else:
+            threading.Thread(target=self.delayed_classification, args=(file_path,), daemon=True).start()
 
+    def is_ready(self, file_path):
         if not self.running or not os.path.exists(file_path):
             log(f"文件已消失或监视已暂停: {file_path}")
             with processed_lock:
                 if file_path in processed_files:
                     processed_files.remove(file_path)
-            return
+            return False
 
         try:
             with open(file_path, 'rb'):
                 pass
         except Exception as e:
             log(f"文件无法访问（仍在复制中？）：{file_path} - {e}")
+            return False
+        return True
+
+    def delayed_classification(self, file_path):
+        log(f"等待 {DELAY_SECONDS} 秒后尝试识别文件：{file_path}")
+        time.sleep(DELAY_SECONDS)
+
+        if self.is_ready(file_path):
+            self.handle_result(file_path, classify_file(file_path))
+
+    def release(self, paths):
+        """批量分类失败时从处理缓存中移除，之后再拖入同一文件还能重新识别"""
+        log(f"批量分类失败，{len(paths)} 个文件未处理")
+        with processed_lock:
+            processed_files.difference_update(paths)
+
+    def classify_batch(self, paths):
+        """微批处理回调：批量分类后各文件仍按原流程逐个确认、移动"""
+        paths = [p for p in paths if self.is_ready(p)]
+        if not paths:
             return
+        subjects = classify_paths(paths)
+        for file_path in paths:
+            threading.Thread(target=self.handle_result, args=(file_path, subjects[file_path]), daemon=True).start()
 
-        subject = classify_file(file_path)
+    def handle_result(self, file_path, subject):
         filename = os.path.basename(file_path)
+        result = take_result(file_path)
 
         if subject:
             dest_folder = os.path.join(OUTPUT_BASE_FOLDER, subject)
@@ -276,8 +324,9 @@ class FileHandler(FileSystemEventHandler):
             dest_path = os.path.join(dest_folder, filename)
             try:
                 if not self.handle_user_feedback(subject, file_path):
-                    log(f"用户标记为误判，文件保留在原始位置")
+                    self.handle_correction(file_path, subject, result)
                 else:
+                    update_near_dup(result, subject)
                     shutil.move(file_path, dest_path)
                     log(f"文件 {filename} 分类为：{subject}，已归类到 {dest_folder}/")
                     try:
@@ -311,6 +360,29 @@ class FileHandler(FileSystemEventHandler):
             log("用户反馈: 分类正确或超时")
             return True
 
+    def handle_correction(self, file_path, predicted, result=None):
+        """询问正确的学科：记录纠正、在后台更新模型，并把文件归类到正确的学科"""
+        filename = os.path.basename(file_path)
+        subject = ask_correct_subject(file_path, predicted) if ONLINE_LEARNING else None
+        try:
+            update_near_dup(result, subject)
+        except Exception as e:
+            log(f"更新近似重复索引失败：{filename} - {e}")
+        if not subject:
+            log(f"用户标记为误判，文件保留在原始位置")
+            return
+
+        dest_folder = os.path.join(OUTPUT_BASE_FOLDER, subject)
+        dest_path = os.path.join(dest_folder, filename)
+        ensure_folder_exists(dest_folder)
+        shutil.move(file_path, dest_path)
+        log(f"文件 {filename} 按用户纠正归类到 {dest_folder}/")
+        try:
+            # 级联分类时模型看到的文本，不必重新提取
+            learn_correction(dest_path, predicted, subject, result["text"] if result is not None else None)
+        except Exception as e:
+            log(f"记录纠正失败：{filename} - {e}")
+
 # ==================== 用户反馈处理 ====================
 def move_back(file_path):
     filename = os.path.basename(file_path)
@@ -326,6 +398,64 @@ def move_back(file_path):
     except FileNotFoundError:
         pass
 
+# 纠正弹窗都在同一个界面线程中依次显示：每个文件的反馈在各自的线程中处理，Tk 不能在多个线程中同时运行
+dialog_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dialog")
+
+def ask_correct_subject(file_path, predicted):
+    """弹窗让用户选择正确的学科，取消或关闭窗口时返回 None；同时有多个文件时排队依次弹出"""
+    return dialog_executor.submit(show_correction_dialog, file_path, predicted).result()
+
+def show_correction_dialog(file_path, predicted):
+    import tkinter as tk
+    from tkinter import ttk
+    clf, _ = model.get()
+    subjects = [s for s in dict.fromkeys([str(c) for c in clf.classes_] + list(SUBJECT_KEYWORDS)) if s != predicted]
+    selected = []
+
+    root = tk.Tk()
+    root.title("AI课件分类器 - 纠正分类")
+    root.attributes("-topmost", True)
+    tk.Label(root, text=f"{os.path.basename(file_path)}\n被识别为“{predicted}”，正确的学科是：").pack(padx=10, pady=5)
+    choice = tk.StringVar(value=subjects[0] if subjects else "")
+    ttk.Combobox(root, textvariable=choice, values=subjects, state="readonly").pack(padx=10, pady=5)
+
+    def confirm():
+        selected.append(choice.get())
+        root.destroy()
+
+    buttons = tk.Frame(root)
+    buttons.pack(pady=10)
+    tk.Button(buttons, text="确定", command=confirm).pack(side="left", padx=5)
+    tk.Button(buttons, text="取消", command=root.destroy).pack(side="left", padx=5)
+    root.mainloop()
+    return selected[0] if selected and selected[0] else None
+
+# ==================== 在线学习 ====================
+learner = None
+learner_lock = threading.Lock()
+
+def learn_correction(file_path, predicted, subject, content=None):
+    """把文件文本和正确学科追加到反馈记录，模型在后台增量更新后替换；
+    没有分类时的文本（文件名即已识别或未启用级联）时在后台线程中提取，不阻塞通知线程"""
+    global learner
+    import online_learning
+    with learner_lock:
+        if learner is None:
+            learner = online_learning.OnlineLearner(model)
+    if content is None:
+        threading.Thread(target=submit_correction, args=(file_path, predicted, subject), daemon=True).start()
+    else:
+        submit_correction(file_path, predicted, subject, content)
+
+def submit_correction(file_path, predicted, subject, content=None):
+    try:
+        if content is None:
+            content = extract_content(file_path) or ""
+        learner.submit(content, subject, file_path, predicted, extract_cache.fingerprint(file_path))
+        log(f"已记录纠正：{os.path.basename(file_path)} {predicted} -> {subject}")
+    except Exception as e:
+        log(f"记录纠正失败：{os.path.basename(file_path)} - {e}")
+
 # ==================== 启动后台监控 ====================
 watcher = None
 
@@ -364,6 +494,7 @@ def create_tray_icon():
     return Image.open("icon.ico")
 
 def view_log(icon, item):
+    from tkinter import messagebox
     if os.path.exists("file_classifier.log"):
         try:
             os.startfile("file_classifier.log")
@@ -374,6 +505,7 @@ def view_log(icon, item):
         messagebox.showerror("错误", "日志文件不存在")
 
 def clear_log(icon, item):
+    from tkinter import messagebox
     try:
         open("file_classifier.log", "w").close()
         messagebox.showinfo("提示", "日志已清空")
@@ -381,6 +513,7 @@ def clear_log(icon, item):
         messagebox.showerror("错误", f"清空日志失败: {e}")
 
 def open_config(icon, item):
+    from tkinter import messagebox
     config_editor_path = "config_editor.py"
     if os.path.exists("config_editor.exe"):
         config_editor_path = "config_editor.exe"
@@ -407,11 +540,18 @@ def toggle_watcher(icon, item):
 def exit_app(icon, item):
     if watcher is not None:
         stop_file_watcher()
+    sandbox.shutdown()
+    if "ocr_engine" in sys.modules:
+        # 只有加载过提取模块时才有 OCR 进程池需要关闭
+        sys.modules["ocr_engine"].shutdown()
     icon.stop()
     os._exit(0)
 
 # ==================== 主程序入口 ====================
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    if not FAST_START:
+        lazy_loader.warm_up(model, ["extractors"]).join()
     start_file_watcher()
 
     tray_icon = icon("AI课件分类器", create_tray_icon(), menu=menu(
@@ -423,4 +563,6 @@ if __name__ == "__main__":
     ))
 
 
+    if FAST_START:
+        lazy_loader.warm_up(model, ["extractors"])
     tray_icon.run()
\ No newline at end of file
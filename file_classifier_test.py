@@ -4,7 +4,6 @@ import time
 import re
 import shutil
 import threading
-from collections import defaultdict
 import json
 import logging
 from watchdog.observers import Observer
@@ -14,10 +13,11 @@ from pystray import Icon as icon, Menu as menu, MenuItem as item
 import joblib
 import docx
 import pptx
-import fitz  # PyMuPDF
 import pytesseract
 import cv2
-import tempfile
+import extractors
+import keyword_matcher
+from model_input import model_text
 from tkinter import Tk, messagebox
 
 # ==================== 配置参数 ====================
@@ -76,15 +76,8 @@ def extract_pptx(file_path):
         return None
 
 def extract_pdf(file_path):
-    try:
-        doc = fitz.open(file_path)
-        text = '\n'.join(page.get_text() for page in doc)
-        if not text.strip():
-            raise ValueError("PDF无文本内容，尝试OCR")
-        return text
-    except Exception as e:
-        log(f"PDF原生提取失败，尝试OCR：{file_path} - {e}")
-        return ocr_pdf(file_path)
+    """逐页混合提取：有文本的页用原生文本，图片页才 OCR"""
+    return extractors.extract_budgeted(file_path)
 
 def ocr_image(image_path):
     try:
@@ -97,25 +90,6 @@ def ocr_image(image_path):
         log(f"OCR识别失败: {image_path} - {e}")
         return ""
 
-def ocr_pdf(pdf_path):
-    try:
-        doc = fitz.open(pdf_path)
-        temp_dir = tempfile.mkdtemp()
-        texts = []
-
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            pix = page.get_pixmap(dpi=200)
-            img_path = os.path.join(temp_dir, f"page_{page_num}.png")
-            pix.save(img_path)
-            texts.append(ocr_image(img_path))
-
-        shutil.rmtree(temp_dir)
-        return '\n'.join(texts)
-    except Exception as e:
-        log(f"OCR转换失败: {pdf_path} - {e}")
-        return ""
-
 def extract_content(file_path):
     ext = os.path.splitext(file_path)[1].lower()
     if ext == ".docx":
@@ -139,19 +113,7 @@ except Exception as e:
 def guess_by_filename(filename):
     filename_base = os.path.splitext(os.path.basename(filename))[0]
     filename_base = clean_text(filename_base)
-    scores = defaultdict(int)
-
-    for subject, keywords in SUBJECT_KEYWORDS.items():
-        for keyword in keywords:
-            if re.search(keyword, filename_base, re.IGNORECASE):
-                scores[subject] += 1
-
-    if not scores:
-        return None
-
-    max_score = max(scores.values())
-    candidates = [k for k, v in scores.items() if v == max_score]
-    return candidates[0] if len(candidates) == 1 else None
+    return keyword_matcher.get_matcher(SUBJECT_KEYWORDS).best(filename_base)
 
 # ==================== 主分类逻辑（先文件名后内容）====================
 def classify_file(file_path):
@@ -162,11 +124,18 @@ def classify_file(file_path):
 
     content = extract_content(file_path)
     if content and len(content.strip()) >= 30:
-        X = vectorizer.transform([content])
+        X = vectorizer.transform([model_text(file_path, content)])
         ai_subject = clf.predict(X)[0]
         log(f"[AI模型识别] 文件 {os.path.basename(file_path)} 分类为：{ai_subject}")
         return ai_subject
 
+    # 正文太短不足以交给模型时，用正文中的学科关键词判断
+    if content:
+        keyword_subject = keyword_matcher.get_matcher(SUBJECT_KEYWORDS).best(content)
+        if keyword_subject:
+            log(f"[正文关键词识别] 文件 {os.path.basename(file_path)} 分类为：{keyword_subject}")
+            return keyword_subject
+
     return None
 
 # ==================== 日志模块 ====================
@@ -0,0 +1,128 @@
+"""
+学科关键词多模式匹配（Aho–Corasick 自动机）。
+
+原先每次判断都对 SUBJECT_KEYWORDS 中约 90 个关键词逐个 re.search，
+这里把所有关键词编译成一个自动机，一次扫描文本就能得到每个学科命中的关键词，
+耗时只与文本长度有关，因此也能用来扫描提取出的正文。
+计分方式与原来一致：每个学科命中的不同关键词数，忽略大小写。
+"""
+import re
+import threading
+from collections import defaultdict
+
+
+class KeywordMatcher:
+    def __init__(self, subject_keywords):
+        self.keywords = []
+        self.keyword_subjects = []
+        index = {}
+        for subject, keywords in subject_keywords.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if not keyword:
+                    continue
+                if keyword not in index:
+                    index[keyword] = len(self.keywords)
+                    self.keywords.append(keyword)
+                    self.keyword_subjects.append([])
+                subjects = self.keyword_subjects[index[keyword]]
+                if subject not in subjects:
+                    subjects.append(subject)
+        self._build()
+
+    def _build(self):
+        # 状态 0 为根；goto[s] 为转移表，output[s] 为在状态 s 结束的关键词编号
+        self.goto = [{}]
+        self.output = [[]]
+        for kid, keyword in enumerate(self.keywords):
+            state = 0
+            for ch in keyword:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.output.append([])
+                state = nxt
+            self.output[state].append(kid)
+
+        # 按层次遍历计算失败指针，并把失败状态的输出合并进来
+        self.fail = [0] * len(self.goto)
+        layer = list(self.goto[0].values())
+        order = list(layer)
+        while layer:
+            next_layer = []
+            for state in layer:
+                for ch, nxt in self.goto[state].items():
+                    f = self.fail[state]
+                    while f and ch not in self.goto[f]:
+                        f = self.fail[f]
+                    target = self.goto[f].get(ch, 0)
+                    self.fail[nxt] = target if target != nxt else 0
+                    self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+                    next_layer.append(nxt)
+                    order.append(nxt)
+            layer = next_layer
+
+        # 把失败指针展开成完整的转移表，扫描时每个字符只查一次字典
+        self.delta = [dict(self.goto[0])]
+        self.delta.extend({} for _ in range(len(self.goto) - 1))
+        for state in order:
+            table = dict(self.delta[self.fail[state]])
+            table.update(self.goto[state])
+            self.delta[state] = table
+
+        # 不属于任何关键词的字符必然回到根状态，只需扫描由关键词字符组成的片段
+        alphabet = sorted(set("".join(self.keywords)))
+        self.segment_re = re.compile("[" + "".join(re.escape(ch) for ch in alphabet) + "]+") if alphabet else None
+
+    def scan(self, text):
+        """返回文本中出现过的关键词编号集合"""
+        found = set()
+        if self.segment_re is None:
+            return found
+        delta, output = self.delta, self.output
+        for segment in self.segment_re.findall(text.lower()):
+            state = 0
+            for ch in segment:
+                state = delta[state].get(ch, 0)
+                if output[state]:
+                    found.update(output[state])
+        return found
+
+    def matches(self, text):
+        """文本中出现过的关键词（小写）"""
+        return sorted(self.keywords[kid] for kid in self.scan(text))
+
+    def scores(self, text):
+        """每个学科命中的不同关键词数"""
+        scores = defaultdict(int)
+        for kid in self.scan(text):
+            for subject in self.keyword_subjects[kid]:
+                scores[subject] += 1
+        return scores
+
+    def best(self, text):
+        """得分唯一最高的学科；没有命中或并列时返回 None"""
+        scores = self.scores(text)
+        if not scores:
+            return None
+        max_score = max(scores.values())
+        candidates = [k for k, v in scores.items() if v == max_score]
+        return candidates[0] if len(candidates) == 1 else None
+
+
+_matcher = None
+_matcher_key = None
+_matcher_lock = threading.Lock()
+
+
+def get_matcher(subject_keywords):
+    """进程内共享的自动机；关键词表内容变化时自动重建"""
+    global _matcher, _matcher_key
+    key = tuple((subject, tuple(keywords)) for subject, keywords in subject_keywords.items())
+    with _matcher_lock:
+        if key != _matcher_key:
+            _matcher = KeywordMatcher(subject_keywords)
+            _matcher_key = key
+        return _matcher
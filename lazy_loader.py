@@ -0,0 +1,111 @@
+"""
+托盘程序的快速启动支持：模型和重量级模块延迟到第一次使用时加载，
+或在托盘图标出现后由后台线程预热。
+
+原先启动时要先导入 cv2、fitz、sklearn 等并反序列化模型，托盘图标要等好几秒才出现；
+通过 spawn 启动的 OCR / 提取子进程还会重新执行主模块，每个都重复加载一次模型。
+"""
+import os
+import time
+import logging
+import threading
+import importlib
+
+logger = logging.getLogger(__name__)
+
+PKL_FILES = ("subject_classifier.pkl", "tfidf_vectorizer.pkl")
+
+
+def import_timed(name):
+    """导入模块并返回耗时（秒）；已导入的模块耗时接近 0"""
+    start = time.perf_counter()
+    importlib.import_module(name)
+    return time.perf_counter() - start
+
+
+class LazyModel:
+    """分类模型，第一次调用 get() 时加载，多线程并发调用只加载一次"""
+
+    def __init__(self, compact=True):
+        self.compact = compact
+        self.version = 0
+        self.loaded_version = 0    # 从磁盘加载的在线更新版本，swap() 后词表仍映射自该版本的文件
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _use_compact(self):
+        import compact_model
+        return self.compact and compact_model.exists()
+
+    def available(self):
+        """只检查模型文件是否存在，不加载"""
+        import compact_model
+        return (self.compact and compact_model.exists()) or all(os.path.exists(p) for p in PKL_FILES)
+
+    def base_file(self):
+        """训练生成的基础模型文件，在线更新的版本以它的修改时间判断是否仍然有效"""
+        import compact_model
+        if self._use_compact():
+            return os.path.join(compact_model.MODEL_DIR, "meta.json")
+        return PKL_FILES[0]
+
+    def load(self):
+        start = time.perf_counter()
+        import online_learning
+        info = online_learning.current_version(self.base_file())
+        if info is not None:
+            # 用户纠正后在线更新过的版本
+            clf, vectorizer = online_learning.load_version(info)
+            self.version = self.loaded_version = info["version"]
+            kind = f"在线更新模型 v{info['version']}"
+        elif self._use_compact():
+            # 内存映射的紧凑模型，几毫秒即可加载，不需要 sklearn
+            import compact_model
+            clf, vectorizer = compact_model.load()
+            kind = "紧凑模型"
+        else:
+            import joblib
+            clf = joblib.load(PKL_FILES[0])
+            vectorizer = joblib.load(PKL_FILES[1])
+            kind = "pkl 模型"
+        logger.info(f"{kind}加载完成，耗时 {time.perf_counter() - start:.2f}s")
+        return clf, vectorizer
+
+    def get(self):
+        """返回 (clf, vectorizer)"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self.load()
+        return self._model
+
+    def swap(self, clf, vectorizer, version):
+        """替换为新版本；正在进行的分类仍使用替换前取到的 (clf, vectorizer)"""
+        with self._lock:
+            self._model = (clf, vectorizer)
+            self.version = version
+
+    def in_use(self):
+        """正在使用、不能删除的在线更新版本号"""
+        return {v for v in (self.version, self.loaded_version) if v}
+
+
+def warm_up(model, modules=()):
+    """在后台线程中依次导入模块并加载模型，记录各自耗时"""
+    def run():
+        timings = []
+        for name in modules:
+            try:
+                timings.append(f"{name} {import_timed(name):.2f}s")
+            except Exception as e:
+                logger.info(f"预热导入 {name} 失败: {e}")
+        try:
+            model.get()
+        except Exception as e:
+            logger.info(f"预热加载模型失败: {e}")
+        if timings:
+            logger.info(f"后台预热完成：{'，'.join(timings)}")
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
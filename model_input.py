@@ -0,0 +1,10 @@
+"""
+模型输入文本：训练、级联分类、批量分类、单文件分类和在线学习都用同一个函数拼接，
+保证同一个文件无论走哪条路径，交给向量化器的文本都相同。
+"""
+import os
+
+
+def model_text(file_path, content):
+    """文件名（不含扩展名） + 正文，与 train.py 训练时一致"""
+    return f"{os.path.splitext(os.path.basename(file_path))[0]} {content}"
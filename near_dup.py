@@ -0,0 +1,229 @@
+"""
+基于 MinHash + LSH 的近似重复文档检测。
+
+同一课件的多个变体（如"匀变速直线运动规律应用ck(1).pptx"）内容几乎一样，却都要完整提取、分类一遍。
+每个文档取正文的字符 SHINGLE_SIZE-gram 集合，用 NUM_PERM 个哈希函数计算 MinHash 签名，
+两个签名相同位置取值相等的比例即 Jaccard 相似度的估计。签名按 BANDS 段分桶（LSH），
+只和至少一段完全相同的文档比较，查询不随索引规模线性增长。
+
+    托盘程序  级联分类读到完整原生文本后查索引，模型不够确定但预测的学科与相似度达到
+              NEAR_DUP_THRESHOLD 的已分类文档一致时即采用；分类完成的文档加入索引（near_dup.db），
+              用户纠正后同步更新
+    train.py  训练前按同样的方法去掉近似重复的文档
+"""
+import re
+import json
+import zlib
+import time
+import sqlite3
+import threading
+import logging
+import numpy as np
+
+# ==================== 配置参数 ====================
+CONFIG_FILE = "config.json"
+try:
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        config = json.load(f)
+except FileNotFoundError:
+    config = {}
+
+INDEX_FILE = config.get("NEAR_DUP_FILE", "near_dup.db")
+THRESHOLD = config.get("NEAR_DUP_THRESHOLD", 0.8)
+MAX_ENTRIES = config.get("NEAR_DUP_MAX_ENTRIES", 20000)
+# 正文少于该字数时太笼统（如只有标题），不参与近似重复判断
+MIN_CHARS = config.get("NEAR_DUP_MIN_CHARS", 50)
+# 只取前这么多字计算签名，长文档的耗时有上限
+MAX_CHARS = 5000
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# 哈希函数 (a * x + b) mod p，p 为小于 2^32 的最大素数；a、b、x 都小于 p，uint64 运算不会溢出
+_PRIME = np.uint64(4294967291)
+_rng = np.random.RandomState(42)
+_A = _rng.randint(1, 4294967291, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+_B = _rng.randint(0, 4294967291, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== 签名 ====================
+def shingles(text):
+    text = re.sub(r'\s+', ' ', text).strip().lower()[:MAX_CHARS]
+    if len(text) < MIN_CHARS:
+        return set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def signature(text):
+    """MinHash 签名（NUM_PERM 个 uint64）；正文太短时返回 None"""
+    grams = shingles(text)
+    if not grams:
+        return None
+    # crc32 与进程无关（内置 hash() 每个进程随机化），签名可以保存到磁盘
+    x = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams)) % _PRIME
+    return ((_A[:, None] * x[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def similarity(a, b):
+    """两个签名估计的 Jaccard 相似度"""
+    return float(np.mean(a == b))
+
+
+# ==================== 索引 ====================
+class NearDupIndex:
+    """key 为文档标识（托盘程序用内容指纹，train.py 用相对路径），可附带学科；path 为空时只在内存中"""
+
+    def __init__(self, path=None, threshold=THRESHOLD, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries = {}    # key -> [签名, 学科]，按加入顺序
+        self._buckets = [{} for _ in range(BANDS)]
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._load()
+
+    def _bands(self, sig):
+        return [sig[i * ROWS:(i + 1) * ROWS].tobytes() for i in range(BANDS)]
+
+    def _insert(self, key, sig, subject):
+        self._entries[key] = [sig, subject]
+        for bucket, band in zip(self._buckets, self._bands(sig)):
+            bucket.setdefault(band, set()).add(key)
+
+    def _delete(self, key):
+        sig, _ = self._entries.pop(key)
+        for bucket, band in zip(self._buckets, self._bands(sig)):
+            keys = bucket.get(band)
+            keys.discard(key)
+            if not keys:
+                del bucket[band]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def query(self, sig):
+        """返回最相似且达到阈值的 (key, 学科, 相似度)，没有时返回 None"""
+        if sig is None:
+            return None
+        with self._lock:
+            candidates = set()
+            for bucket, band in zip(self._buckets, self._bands(sig)):
+                candidates |= bucket.get(band, set())
+            best = None
+            for key in candidates:
+                score = similarity(sig, self._entries[key][0])
+                if score >= self.threshold and (best is None or score > best[2]):
+                    best = (key, self._entries[key][1], score)
+            return best
+
+    def add(self, key, sig, subject=None):
+        if sig is None:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._delete(key)
+            self._insert(key, sig, subject)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._delete(oldest)
+                evicted.append(oldest)
+            self._save(key, sig, subject, evicted)
+
+    def relabel(self, key, subject):
+        """用户纠正后更新学科，之后的近似重复文档沿用纠正后的结果"""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._entries[key][1] = subject
+            self._save(key, self._entries[key][0], subject)
+            return True
+
+    def remove(self, key):
+        """用户否定分类结果且没有给出正确学科时删除，错误的学科不再被沿用"""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._delete(key)
+            self._save_removed([key])
+            return True
+
+    # ---------- 持久化 ----------
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS signatures (
+                                      key TEXT PRIMARY KEY,
+                                      subject TEXT,
+                                      signature BLOB NOT NULL,
+                                      added REAL NOT NULL)""")
+            self._conn.commit()
+        return self._conn
+
+    def _load(self):
+        try:
+            rows = self._connect().execute(
+                "SELECT key, subject, signature FROM signatures ORDER BY added").fetchall()
+        except sqlite3.Error as e:
+            logger.info(f"近似重复索引读取失败: {e}")
+            return
+        for key, subject, blob in rows[-self.max_entries:]:
+            sig = np.frombuffer(blob, dtype=np.uint64)
+            if len(sig) == NUM_PERM:
+                self._insert(key, sig, subject)
+        logger.info(f"近似重复索引已加载 {len(self._entries)} 个文档")
+
+    def _save(self, key, sig, subject, evicted=()):
+        if not self.path:
+            return
+        try:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO signatures (key, subject, signature, added) VALUES (?, ?, ?, ?)",
+                         (key, subject, sig.astype(np.uint64).tobytes(), time.time()))
+            conn.executemany("DELETE FROM signatures WHERE key = ?", [(k,) for k in evicted])
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.info(f"近似重复索引写入失败: {e}")
+
+    def _save_removed(self, keys):
+        if not self.path:
+            return
+        try:
+            conn = self._connect()
+            conn.executemany("DELETE FROM signatures WHERE key = ?", [(k,) for k in keys])
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.info(f"近似重复索引写入失败: {e}")
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """托盘程序共用的持久化索引，第一次使用时从 INDEX_FILE 加载"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NearDupIndex(INDEX_FILE)
+        return _index
+
+
+def find_duplicates(texts, threshold=THRESHOLD):
+    """返回 {重复文档下标: 与之近似的先出现文档下标}，每组近似重复只保留最先出现的一个"""
+    index = NearDupIndex(threshold=threshold, max_entries=len(texts) + 1)
+    duplicates = {}
+    for i, text in enumerate(texts):
+        sig = signature(text)
+        match = index.query(sig)
+        if match is not None:
+            duplicates[i] = match[0]
+        else:
+            index.add(i, sig)
+    return duplicates
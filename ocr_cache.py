@@ -0,0 +1,174 @@
+"""
+OCR 结果缓存：以二值化页面图像的感知哈希为键。
+
+模板页、封面、扫描答题卡在不同课件中反复出现，渲染出的图像逐像素未必相同，
+但缩小后的明暗结构几乎一致。键由两部分组成：整页的粗哈希（差值哈希）通过分段索引
+（任一段完全相同即为候选）在 SQLite 中找到候选页面，候选的细哈希也必须完全一致才复用结果。
+粗哈希只反映版式，同一模板只改了标题（如学科名）的页面粗哈希相同，单凭它会把别的学科的文字
+当成这一页的识别结果；细哈希按 64x64 的明暗分布区分这类页面。
+粗哈希默认要求完全相同（OCR_CACHE_MAX_DISTANCE 为 0），调大可以容忍渲染噪点，但误命中的风险也随之增加。
+"""
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+import numpy as np
+import cv2
+
+# ==================== 配置参数 ====================
+CONFIG_FILE = "config.json"
+try:
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        config = json.load(f)
+except FileNotFoundError:
+    config = {}
+
+CACHE_ENABLED = config.get("OCR_CACHE", True)
+CACHE_FILE = config.get("OCR_CACHE_FILE", "ocr_cache.db")
+MAX_ENTRIES = config.get("OCR_CACHE_MAX_ENTRIES", 20000)
+MEMORY_ENTRIES = config.get("OCR_CACHE_MEMORY_ENTRIES", 512)
+# 粗哈希的汉明距离不超过该值（且细哈希相同）视为同一页面；哈希分 8 段，距离 ≤7 时必有一段完全相同
+MAX_DISTANCE = min(config.get("OCR_CACHE_MAX_DISTANCE", 0), 7)
+
+HASH_SIZE = 16  # 16x16 差值哈希，共 256 位
+FINE_SIZE = 64  # 细哈希：64x64 缩略图按 8 级明暗量化后的 BLAKE2b
+BANDS = 8
+BAND_HEX = HASH_SIZE * HASH_SIZE // 4 // BANDS
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== 感知哈希 ====================
+def image_hash(binary):
+    """二值化图像的缓存键："粗哈希:细哈希"（十六进制字符串）
+
+    粗哈希为 256 位差值哈希：先按面积平均缩小到 17x16，相邻像素比较明暗，对渲染 DPI、压缩噪点不敏感。
+    细哈希为 64x64 缩略图的 BLAKE2b，文字不同的页面在这个尺度上明暗分布不同。
+    """
+    small = cv2.resize(binary, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    fine = cv2.resize(binary, (FINE_SIZE, FINE_SIZE), interpolation=cv2.INTER_AREA) >> 5
+    digest = hashlib.blake2b(fine.tobytes(), digest_size=16).hexdigest()
+    return f"{np.packbits(bits).tobytes().hex()}:{digest}"
+
+
+def _split(key):
+    coarse, _, fine = key.partition(":")
+    return coarse, fine
+
+
+def hamming(a, b):
+    return bin(int(_split(a)[0], 16) ^ int(_split(b)[0], 16)).count("1")
+
+
+def _bands(key):
+    coarse = _split(key)[0]
+    return [coarse[i * BAND_HEX:(i + 1) * BAND_HEX] for i in range(BANDS)]
+
+
+# ==================== 存储 ====================
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+_local = threading.local()
+
+_stats = {"memory": 0, "disk": 0, "miss": 0}
+_stats_lock = threading.Lock()
+
+
+def _connect():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(CACHE_FILE, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        band_cols = ", ".join(f"b{i} TEXT NOT NULL" for i in range(BANDS))
+        conn.execute(f"""CREATE TABLE IF NOT EXISTS ocr_results (
+                             key TEXT PRIMARY KEY,
+                             text TEXT NOT NULL,
+                             last_access REAL NOT NULL,
+                             {band_cols})""")
+        for i in range(BANDS):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_b{i} ON ocr_results(b{i})")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_last_access ON ocr_results(last_access)")
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+
+def _remember(key, text):
+    with _memory_lock:
+        _memory[key] = text
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def lookup(key):
+    """返回 (文本, 命中类型)；命中类型为 memory / disk / miss，未命中时文本为 None"""
+    with _memory_lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            return _memory[key], "memory"
+
+    try:
+        conn = _connect()
+        bands = _bands(key)
+        where = " OR ".join(f"b{i} = ?" for i in range(BANDS))
+        best = None
+        for cand_key, text in conn.execute(f"SELECT key, text FROM ocr_results WHERE {where}", bands):
+            # 粗哈希只说明版式相近，细哈希不同（文字不同）时不能复用
+            if _split(cand_key)[1] != _split(key)[1]:
+                continue
+            distance = hamming(key, cand_key)
+            if distance <= MAX_DISTANCE and (best is None or distance < best[0]):
+                best = (distance, cand_key, text)
+        if best is not None:
+            conn.execute("UPDATE ocr_results SET last_access = ? WHERE key = ?", (time.time(), best[1]))
+            conn.commit()
+            _remember(key, best[2])
+            return best[2], "disk"
+    except sqlite3.Error as e:
+        logger.info(f"OCR缓存读取失败: {e}")
+    return None, "miss"
+
+
+def store(key, text):
+    _remember(key, text)
+    try:
+        conn = _connect()
+        conn.execute(f"INSERT OR REPLACE INTO ocr_results VALUES (?, ?, ?, {', '.join('?' * BANDS)})",
+                     (key, text, time.time(), *_bands(key)))
+        count = conn.execute("SELECT COUNT(*) FROM ocr_results").fetchone()[0]
+        if count > MAX_ENTRIES:
+            # 一次淘汰 10%，避免每次写入都触发
+            conn.execute("DELETE FROM ocr_results WHERE key IN "
+                         "(SELECT key FROM ocr_results ORDER BY last_access LIMIT ?)",
+                         (count - int(MAX_ENTRIES * 0.9),))
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.info(f"OCR缓存写入失败: {e}")
+
+
+# ==================== 命中率统计 ====================
+def record(kind):
+    """登记一次查询结果；工作进程里的查询由主进程根据返回的命中类型登记"""
+    with _stats_lock:
+        _stats[kind] += 1
+        total = sum(_stats.values())
+    if total % 50 == 0:
+        logger.info(f"OCR缓存统计: {format_stats()}")
+
+
+def stats():
+    with _stats_lock:
+        result = dict(_stats)
+    total = sum(result.values())
+    result["hit_rate"] = (result["memory"] + result["disk"]) / total if total else 0.0
+    return result
+
+
+def format_stats():
+    s = stats()
+    return f"内存命中{s['memory']}，持久缓存命中{s['disk']}，未命中{s['miss']}，命中率{s['hit_rate']:.1%}"
@@ -0,0 +1,381 @@
+import os
+import re
+import json
+import time
+import threading
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import cv2
+import fitz  # PyMuPDF
+import pytesseract
+import ocr_cache
+import tess_pool
+
+# ==================== 配置参数 ====================
+CONFIG_FILE = "config.json"
+try:
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        config = json.load(f)
+except FileNotFoundError:
+    config = {}
+
+# 子进程也会导入本模块，因此在这里设置 Tesseract 路径
+pytesseract.pytesseract.tesseract_cmd = config.get(
+    "TESSERACT_PATH", r"C:\Program Files\Tesseract-OCR\tesseract.exe")
+
+OCR_DPI = 200
+OCR_LANG = 'chi_sim'
+
+# 自适应分辨率：先用低 DPI 识别，平均置信度不足时才用高 DPI 重新渲染
+OCR_ADAPTIVE = config.get("OCR_ADAPTIVE", True)
+OCR_LOW_DPI = config.get("OCR_LOW_DPI", 120)
+OCR_HIGH_DPI = config.get("OCR_HIGH_DPI", 300)
+OCR_MIN_CONFIDENCE = config.get("OCR_MIN_CONFIDENCE", 70)
+
+# 短边小于该像素数的嵌入图片不做 OCR
+MIN_IMAGE_SIDE = 64
+
+logger = logging.getLogger(__name__)
+
+
+_worker_override = None
+
+
+def set_worker_count(workers):
+    """覆盖 OCR_WORKERS；在已经按文件并行的工作进程里设为 1，避免进程池嵌套"""
+    global _worker_override
+    _worker_override = workers
+
+
+def get_worker_count():
+    """OCR 进程数，来自 config.json 的 OCR_WORKERS，未设置时按 CPU 核数决定"""
+    if _worker_override:
+        return _worker_override
+    workers = config.get("OCR_WORKERS", 0)
+    if not workers or workers < 1:
+        workers = max(1, (os.cpu_count() or 2) - 1)
+    return workers
+
+
+# ==================== 单页 OCR（在工作进程中执行）====================
+def binarize(gray):
+    _, binary = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
+    return binary
+
+
+def image_to_string(binary):
+    """识别二值图像；有常驻进程池时交给池，否则每次启动 tesseract"""
+    if tess_pool.available():
+        return tess_pool.get_pool(get_worker_count(), OCR_LANG).recognize(binary)[0]
+    return pytesseract.image_to_string(binary, lang=OCR_LANG)
+
+
+def recognize(binary):
+    """识别二值图像，先查感知哈希缓存；返回 (文本, 缓存命中类型)"""
+    if not ocr_cache.CACHE_ENABLED:
+        return image_to_string(binary), "miss"
+    key = ocr_cache.image_hash(binary)
+    text, kind = ocr_cache.lookup(key)
+    if text is None:
+        text = image_to_string(binary)
+        ocr_cache.store(key, text)
+    return text, kind
+
+
+def ocr_array(gray):
+    """对内存中的灰度图像进行 OCR 识别"""
+    text, kind = recognize(binarize(gray))
+    ocr_cache.record(kind)
+    return text
+
+
+def ocr_image(image_path):
+    """对图像文件进行 OCR 识别"""
+    try:
+        img = cv2.imread(image_path)
+        return ocr_array(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+    except Exception as e:
+        logger.info(f"OCR识别失败: {image_path} - {e}")
+        return ""
+
+
+# PyMuPDF 不支持多线程并发调用；线程模式下所有 fitz 操作串行，识别仍然并行
+fitz_lock = threading.RLock()
+
+
+def render_gray(page, dpi=OCR_DPI):
+    """直接渲染为单通道灰度 Pixmap，省去 RGB 渲染和颜色转换"""
+    with fitz_lock:
+        return page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+
+
+def pixmap_to_array(pix):
+    """把 Pixmap.samples 缓冲区零拷贝地包装为 NumPy 数组
+
+    返回的数组与 pix 共用内存，使用期间必须保持 pix 存活。
+    """
+    return np.ndarray((pix.height, pix.width, pix.n), dtype=np.uint8,
+                      buffer=pix.samples_mv, strides=(pix.stride, pix.n, 1))
+
+
+def ocr_pixmap(pix):
+    """对灰度 Pixmap 进行 OCR，全程不落盘"""
+    gray = pixmap_to_array(pix)[:, :, 0]
+    return ocr_array(gray)
+
+
+def render_binary(page, dpi):
+    pix = render_gray(page, dpi)
+    # binarize 返回新数组，之后 pix 可以释放
+    return binarize(pixmap_to_array(pix)[:, :, 0])
+
+
+def recognize_with_confidence(binary):
+    """用 image_to_data 识别，返回 (文本, 单词平均置信度)"""
+    if tess_pool.available():
+        return tess_pool.get_pool(get_worker_count(), OCR_LANG).recognize(binary)
+    data = pytesseract.image_to_data(binary, lang=OCR_LANG, output_type=pytesseract.Output.DICT)
+    lines = {}
+    confs = []
+    for i, word in enumerate(data["text"]):
+        conf = float(data["conf"][i])
+        if conf < 0 or not word.strip():
+            continue
+        confs.append(conf)
+        line_key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(line_key, []).append(word)
+    text = '\n'.join(' '.join(words) for words in lines.values())
+    return text, (sum(confs) / len(confs) if confs else 0.0)
+
+
+def recognize_adaptive(page):
+    """自适应分辨率识别一页，返回 (文本, 缓存命中类型, 最终使用的 DPI)"""
+    binary = render_binary(page, OCR_LOW_DPI)
+    key = None
+    if ocr_cache.CACHE_ENABLED:
+        # 差值哈希与分辨率无关，低 DPI 图像也能命中高 DPI 识别过的页面
+        key = ocr_cache.image_hash(binary)
+        text, kind = ocr_cache.lookup(key)
+        if text is not None:
+            return text, kind, OCR_LOW_DPI
+
+    if np.count_nonzero(binary == 0) < binary.size * 0.001:
+        text, dpi = "", OCR_LOW_DPI  # 几乎没有墨迹的空白页，不必提高分辨率
+    else:
+        text, confidence = recognize_with_confidence(binary)
+        dpi = OCR_LOW_DPI
+        if confidence < OCR_MIN_CONFIDENCE:
+            text = image_to_string(render_binary(page, OCR_HIGH_DPI))
+            dpi = OCR_HIGH_DPI
+
+    if key is not None:
+        ocr_cache.store(key, text)
+    return text, "miss", dpi
+
+
+def _ocr_page_task(pdf_path, page_num, dpi):
+    """渲染并识别 PDF 的一页，返回 (页码, 文本, 缓存命中类型, 使用的 DPI)
+
+    dpi 为 None 时按自适应分辨率识别。命中统计由调用方（主进程）登记，
+    工作进程里的计数无法汇总。
+    """
+    doc = None
+    try:
+        with fitz_lock:
+            doc = fitz.open(pdf_path)
+            page = doc.load_page(page_num)
+        if dpi is None:
+            return (page_num,) + recognize_adaptive(page)
+        text, kind = recognize(render_binary(page, dpi))
+        return page_num, text, kind, dpi
+    except Exception as e:
+        logger.info(f"OCR识别失败: {pdf_path} 第{page_num + 1}页 - {e}")
+        return page_num, "", "miss", dpi
+    finally:
+        if doc is not None:
+            with fitz_lock:
+                doc.close()
+
+
+def _ocr_image_bytes_task(index, data):
+    """解码并识别一张编码后的图片，返回 (序号, 文本, 缓存命中类型)"""
+    try:
+        gray = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if gray is None or min(gray.shape[:2]) < MIN_IMAGE_SIDE:
+            return index, "", None
+        text, kind = recognize(binarize(gray))
+        return index, text, kind
+    except Exception as e:
+        logger.info(f"图片OCR失败: 第{index + 1}张 - {e}")
+        return index, "", None
+
+
+# ==================== 进程池 ====================
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """全局共享的有界执行器，首次使用时创建
+
+    有常驻 Tesseract 进程池时，识别已经在池中的进程里并行，
+    这里只需要线程负责渲染和分发；否则每页在独立进程中渲染并调用 tesseract。
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if tess_pool.available():
+                _executor = ThreadPoolExecutor(max_workers=get_worker_count())
+            else:
+                _executor = ProcessPoolExecutor(max_workers=get_worker_count())
+        return _executor
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+    tess_pool.shutdown()
+
+
+# ==================== 并行 OCR ====================
+def ocr_pages(pdf_path, page_numbers, min_chars=None, dpi=None, time_limit=None):
+    """并行 OCR 指定页，返回 {页码: 文本}
+
+    min_chars 不为空时，一旦按页序连续识别出的文本达到该字数，
+    就取消尚未开始的页，只返回这段连续前缀；耗时超过 time_limit 时同样取消剩余页，
+    返回到期前按页序连续完成的前缀，已识别的页不会丢掉。
+    dpi 为 None 时使用配置的默认方式（自适应或固定 OCR_DPI）。
+    """
+    page_numbers = list(page_numbers)
+    if not page_numbers:
+        return {}
+    if dpi is None and not OCR_ADAPTIVE:
+        dpi = OCR_DPI
+
+    escalated = []
+    if get_worker_count() == 1:
+        results = _ocr_pages_serial(pdf_path, page_numbers, min_chars, dpi, escalated, time_limit)
+        _log_escalation(pdf_path, dpi, results, escalated)
+        return results
+
+    started = time.monotonic()
+    executor = _get_executor()
+    pending = {executor.submit(_ocr_page_task, pdf_path, n, dpi) for n in page_numbers}
+    results = {}
+    try:
+        next_idx = 0
+        prefix_chars = 0
+        while pending:
+            timeout = None
+            if time_limit is not None:
+                timeout = time_limit - (time.monotonic() - started)
+                if timeout <= 0:
+                    logger.info(f"OCR超过时间预算 {os.path.basename(pdf_path)}：{time_limit:.0f}s，取消剩余页")
+                    break
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                page_num, text, kind, used_dpi = future.result()
+                ocr_cache.record(kind)
+                results[page_num] = text
+                if dpi is None and used_dpi == OCR_HIGH_DPI:
+                    escalated.append(page_num)
+            # 按页序推进已完成的连续前缀
+            while next_idx < len(page_numbers) and page_numbers[next_idx] in results:
+                prefix_chars += len(re.sub(r'\s+', '', results[page_numbers[next_idx]]))
+                next_idx += 1
+            if min_chars is not None and prefix_chars >= min_chars:
+                break
+    finally:
+        for future in pending:
+            future.cancel()
+    if pending:
+        # 提前结束时只保留连续前缀，中间缺页的文本不可用
+        results = {n: results[n] for n in page_numbers[:next_idx]}
+    _log_escalation(pdf_path, dpi, results, escalated)
+    return results
+
+
+def _log_escalation(pdf_path, dpi, results, escalated):
+    if dpi is None and results:
+        logger.info(f"自适应OCR {os.path.basename(pdf_path)}：{len(results)}页，"
+                    f"{sum(1 for n in escalated if n in results)}页置信度低于{OCR_MIN_CONFIDENCE}，提升到{OCR_HIGH_DPI}DPI")
+
+
+def _ocr_pages_serial(pdf_path, page_numbers, min_chars, dpi, escalated, time_limit=None):
+    started = time.monotonic()
+    results = {}
+    chars = 0
+    for n in page_numbers:
+        if time_limit is not None and time.monotonic() - started >= time_limit:
+            logger.info(f"OCR超过时间预算 {os.path.basename(pdf_path)}：{time_limit:.0f}s，取消剩余页")
+            break
+        _, text, kind, used_dpi = _ocr_page_task(pdf_path, n, dpi)
+        ocr_cache.record(kind)
+        results[n] = text
+        if dpi is None and used_dpi == OCR_HIGH_DPI:
+            escalated.append(n)
+        chars += len(re.sub(r'\s+', '', text))
+        if min_chars is not None and chars >= min_chars:
+            break
+    return results
+
+
+def ocr_images(blobs, min_chars=None, time_limit=None):
+    """并行 OCR 一组编码后的图片，按输入顺序返回文本列表
+
+    识别出的总字数达到 min_chars 或耗时超过 time_limit 后取消剩余图片，
+    未完成的图片对应空字符串。
+    """
+    if not blobs:
+        return []
+    started = time.monotonic()
+    texts = [""] * len(blobs)
+    chars = 0
+
+    if get_worker_count() == 1:
+        for index, data in enumerate(blobs):
+            if time_limit is not None and time.monotonic() - started >= time_limit:
+                break
+            _, text, kind = _ocr_image_bytes_task(index, data)
+            if kind:
+                ocr_cache.record(kind)
+            texts[index] = text
+            chars += len(re.sub(r'\s+', '', text))
+            if min_chars is not None and chars >= min_chars:
+                break
+        return texts
+
+    executor = _get_executor()
+    pending = {executor.submit(_ocr_image_bytes_task, i, data) for i, data in enumerate(blobs)}
+    try:
+        while pending:
+            timeout = None
+            if time_limit is not None:
+                timeout = time_limit - (time.monotonic() - started)
+                if timeout <= 0:
+                    break
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, text, kind = future.result()
+                if kind:
+                    ocr_cache.record(kind)
+                texts[index] = text
+                chars += len(re.sub(r'\s+', '', text))
+            if min_chars is not None and chars >= min_chars:
+                break
+    finally:
+        for future in pending:
+            future.cancel()
+    return texts
+
+
+def ocr_pdf(pdf_path, min_chars=None, dpi=None):
+    """将 PDF 各页并行转为图像后 OCR 提取文本，输出保持页序"""
+    with fitz_lock, fitz.open(pdf_path) as doc:
+        page_count = len(doc)
+    results = ocr_pages(pdf_path, range(page_count), min_chars=min_chars, dpi=dpi)
+    return '\n'.join(results[n] for n in sorted(results))
@@ -0,0 +1,273 @@
+"""
+用户纠正分类结果后的在线增量学习。
+
+托盘通知中标记为误判并选择正确学科后，文件文本和正确学科追加到反馈记录（FEEDBACK_FILE，每行一条 JSON），
+后台线程用这几条样本对当前模型做少量梯度更新，保存为新版本并替换正在使用的模型，整个过程只需几秒，
+不必重新运行 extract.py 和 train.py 扫描整个语料：
+
+    逻辑回归 / 紧凑模型  只修改反馈文本中出现的词项对应的系数列，按 softmax（或一对多 sigmoid）交叉熵
+                         做梯度下降，并以 ONLINE_L2 把系数拉向更新前的值，直到反馈样本都被判对
+    SGDClassifier        直接用 partial_fit
+
+每次更新都会重放最近 ONLINE_REPLAY 条反馈，避免后面的纠正把前面的纠正抵消。
+版本保存在 MODEL_VERSIONS_DIR/vNNNN 下（紧凑模型为 npy 目录，否则为 pkl），current.json 指向当前版本，
+只保留最近 MODEL_KEEP_VERSIONS 个，但正在使用（以内存映射方式打开）的版本不会被删除。current.json 记录了基础模型文件的修改时间，
+重新训练后基础模型变化，旧版本自动失效；反馈记录仍然保留。
+模型中没有的学科无法增量学习，只记录下来。
+"""
+import os
+import copy
+import json
+import time
+import queue
+import shutil
+import threading
+import logging
+import numpy as np
+import compact_model
+from model_input import model_text
+
+# ==================== 配置参数 ====================
+CONFIG_FILE = "config.json"
+try:
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        config = json.load(f)
+except FileNotFoundError:
+    config = {}
+
+ONLINE_LEARNING = config.get("ONLINE_LEARNING", True)
+FEEDBACK_FILE = config.get("FEEDBACK_FILE", "feedback.jsonl")
+VERSIONS_DIR = config.get("MODEL_VERSIONS_DIR", "model_versions")
+KEEP_VERSIONS = config.get("MODEL_KEEP_VERSIONS", 5)
+LEARNING_RATE = config.get("ONLINE_LEARNING_RATE", 0.5)
+MAX_STEPS = config.get("ONLINE_MAX_STEPS", 100)
+L2 = config.get("ONLINE_L2", 0.1)
+REPLAY = config.get("ONLINE_REPLAY", 50)
+
+CURRENT_FILE = os.path.join(VERSIONS_DIR, "current.json")
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== 反馈记录 ====================
+_feedback_lock = threading.Lock()
+
+
+def append_feedback(text, subject, file_path, predicted=None, fingerprint=None):
+    """追加一条纠正记录并返回该记录"""
+    record = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "path": file_path,
+        "fingerprint": fingerprint,
+        "predicted": predicted,
+        "subject": subject,
+        "text": text,
+    }
+    with _feedback_lock:
+        with open(FEEDBACK_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return record
+
+
+def read_feedback():
+    """按追加顺序返回全部纠正记录，跳过写了一半的行"""
+    records = []
+    with _feedback_lock:
+        try:
+            with open(FEEDBACK_FILE, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            pass
+    return records
+
+
+# ==================== 增量更新 ====================
+def _rows(X):
+    """把 CompactMatrix 或 scipy 稀疏矩阵统一成每行 (列下标, 值)"""
+    if hasattr(X, "rows"):
+        return X.rows
+    X = X.tocsr()
+    return [(X.indices[X.indptr[i]:X.indptr[i + 1]], X.data[X.indptr[i]:X.indptr[i + 1]])
+            for i in range(X.shape[0])]
+
+
+def _gradient_steps(coef, intercept, rows, targets, ovr):
+    """只在反馈样本涉及的列上做梯度下降，返回 (列下标, 新系数列)；反馈样本在 MAX_STEPS 步内全部判对即停止"""
+    columns = np.unique(np.concatenate([index for index, _ in rows]))
+    X = np.zeros((len(rows), len(columns)))
+    for i, (index, values) in enumerate(rows):
+        X[i, np.searchsorted(columns, index)] = values
+    W0 = np.array(coef[:, columns], dtype=np.float64)
+    W = W0.copy()
+    binary = W.shape[0] == 1
+    if binary:
+        Y = (targets == 1).astype(np.float64)[:, None]
+    else:
+        Y = np.zeros((len(rows), W.shape[0]))
+        Y[np.arange(len(rows)), targets] = 1.0
+
+    for _ in range(MAX_STEPS):
+        scores = X @ W.T + intercept
+        predicted = (scores[:, 0] > 0).astype(int) if binary else scores.argmax(axis=1)
+        if (predicted == targets).all():
+            break
+        if binary or ovr:
+            P = 1.0 / (1.0 + np.exp(-scores))
+        else:
+            P = np.exp(scores - scores.max(axis=1, keepdims=True))
+            P /= P.sum(axis=1, keepdims=True)
+        W -= LEARNING_RATE * ((P - Y).T @ X + L2 * (W - W0))
+    return columns, W
+
+
+def apply_feedback(clf, vectorizer, texts, subjects):
+    """用纠正样本更新分类器，返回新的分类器（不修改原分类器）；没有可学习的样本时返回 None"""
+    classes = [str(c) for c in clf.classes_]
+    known = [(text, subject) for text, subject in zip(texts, subjects) if subject in classes]
+    if not known:
+        return None
+
+    if hasattr(clf, "partial_fit"):
+        new_clf = copy.deepcopy(clf)
+        X = vectorizer.transform([text for text, _ in known])
+        y = np.array([subject for _, subject in known], dtype=clf.classes_.dtype)
+        for _ in range(MAX_STEPS):
+            new_clf.partial_fit(X, y)
+            if (new_clf.predict(X) == y).all():
+                break
+        return new_clf
+
+    rows, targets = [], []
+    for (index, values), (_, subject) in zip(_rows(vectorizer.transform([t for t, _ in known])), known):
+        if len(index):
+            rows.append((index, values))
+            targets.append(classes.index(subject))
+    if not rows:
+        return None
+
+    if hasattr(clf, "coef_"):
+        columns, W = _gradient_steps(clf.coef_, clf.intercept_, rows, np.array(targets),
+                                     compact_model.is_ovr(clf))
+        new_clf = copy.deepcopy(clf)
+        new_clf.coef_[:, columns] = W
+    else:
+        columns, W = _gradient_steps(clf.coef, clf.intercept, rows, np.array(targets), clf.ovr)
+        # 紧凑模型的系数是只读内存映射，复制一份再修改
+        coef = np.array(clf.coef)
+        coef[:, columns] = W
+        new_clf = type(clf)(coef, np.array(clf.intercept), clf.meta)
+    return new_clf
+
+
+# ==================== 模型版本 ====================
+def _base_stamp(base_file):
+    return {"file": base_file, "mtime": os.path.getmtime(base_file)}
+
+
+def current_version(base_file):
+    """当前生效的版本信息；没有版本、已关闭在线学习或基础模型已重新训练时返回 None"""
+    if not ONLINE_LEARNING:
+        return None
+    try:
+        with open(CURRENT_FILE, "r", encoding="utf-8") as f:
+            info = json.load(f)
+        if info["base"] != _base_stamp(base_file) or not os.path.isdir(info["dir"]):
+            return None
+        return info
+    except (FileNotFoundError, ValueError, KeyError, OSError):
+        return None
+
+
+def load_version(info):
+    """加载 current_version 返回的版本，返回 (clf, vectorizer)"""
+    if info["kind"] == "compact":
+        return compact_model.load(info["dir"])
+    import joblib
+    return (joblib.load(os.path.join(info["dir"], "subject_classifier.pkl")),
+            joblib.load(os.path.join(info["dir"], "tfidf_vectorizer.pkl")))
+
+
+def save_version(clf, vectorizer, base_file, feedback_count, in_use=()):
+    """保存新版本并把 current.json 指向它，返回版本信息；in_use 中的版本号清理旧版本时跳过"""
+    os.makedirs(VERSIONS_DIR, exist_ok=True)
+    numbers = [int(name[1:]) for name in os.listdir(VERSIONS_DIR) if name[:1] == "v" and name[1:].isdigit()]
+    version = max(numbers, default=0) + 1
+    version_dir = os.path.join(VERSIONS_DIR, f"v{version:04d}")
+
+    if hasattr(clf, "meta"):
+        compact_model.save(clf, vectorizer, version_dir)
+        kind = "compact"
+    else:
+        import joblib
+        os.makedirs(version_dir, exist_ok=True)
+        joblib.dump(clf, os.path.join(version_dir, "subject_classifier.pkl"))
+        joblib.dump(vectorizer, os.path.join(version_dir, "tfidf_vectorizer.pkl"))
+        kind = "pkl"
+
+    info = {"version": version, "dir": version_dir, "kind": kind, "base": _base_stamp(base_file),
+            "feedback": feedback_count, "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+    # 先写临时文件再替换，加载方不会读到写了一半的 current.json
+    with open(CURRENT_FILE + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    os.replace(CURRENT_FILE + ".tmp", CURRENT_FILE)
+
+    # 紧凑模型的词表和系数是内存映射，替换模型时词表沿用最初加载的版本，删除它会破坏正在使用的模型
+    removable = sorted(number for number in numbers if number not in in_use)
+    for number in removable[:max(0, len(numbers) + 1 - KEEP_VERSIONS)]:
+        shutil.rmtree(os.path.join(VERSIONS_DIR, f"v{number:04d}"), ignore_errors=True)
+    return info
+
+
+# ==================== 后台更新 ====================
+class OnlineLearner:
+    """model 为 lazy_loader.LazyModel；submit() 记录纠正后立即返回，更新在后台线程中完成"""
+
+    def __init__(self, model):
+        self.model = model
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def submit(self, text, subject, file_path, predicted=None, fingerprint=None):
+        record = append_feedback(text, subject, file_path, predicted, fingerprint)
+        if not ONLINE_LEARNING:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._queue.put(record)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # 连续的多次纠正合并成一次更新
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._update(batch)
+            except Exception as e:
+                logger.info(f"在线更新失败: {e}")
+
+    def _update(self, batch):
+        start = time.perf_counter()
+        clf, vectorizer = self.model.get()
+        feedback = read_feedback()
+        records = feedback[-max(REPLAY, len(batch)):]
+        new_clf = apply_feedback(clf, vectorizer, [model_text(r["path"], r["text"]) for r in records],
+                                 [r["subject"] for r in records])
+        if new_clf is None:
+            logger.info(f"纠正的学科不在模型中或文本不含词表中的词，已记录，重新训练后生效："
+                        f"{', '.join(r['subject'] for r in batch)}")
+            return
+        info = save_version(new_clf, vectorizer, self.model.base_file(), len(feedback), self.model.in_use())
+        self.model.swap(new_clf, vectorizer, info["version"])
+        logger.info(f"在线更新完成：{len(batch)} 条新纠正（重放 {len(records)} 条），"
+                    f"模型版本 v{info['version']}，耗时 {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,163 @@
+"""
+轻量 OOXML（docx / pptx）文本提取：直接从 zip 中流式读取需要的 XML 部件，
+用 iterparse 增量解析段落，不构建 python-docx / python-pptx 的对象模型，
+也不会读取图片、音视频等媒体部件。
+"""
+import re
+import hashlib
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+A_NS = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+P_NS = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+R_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+NOTES_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/notesSlide"
+IMAGE_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+
+# OpenCV 能解码的位图格式；emf / wmf / svg 等矢量图跳过
+RASTER_EXTS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".gif", ".webp"}
+# 小于该字节数的图片多为图标、项目符号，不值得 OCR
+MIN_IMAGE_BYTES = 4096
+
+
+def iter_paragraphs(zf, part, ns):
+    """增量解析一个 XML 部件，逐段落产出文本
+
+    表格单元格、文本框、组合形状里的段落同样是 <p>，会被一并产出；
+    嵌套段落（如段落内的文本框）各自独立产出。
+    """
+    para_tag, text_tag = ns + "p", ns + "t"
+    tab_tag = ns + "tab"
+    break_tags = {ns + "br", ns + "cr"}
+    stack = []
+    with zf.open(part) as f:
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            if event == "start":
+                if elem.tag == para_tag:
+                    stack.append([])
+                continue
+            if not stack:
+                continue
+            if elem.tag == text_tag:
+                stack[-1].append(elem.text or "")
+            elif elem.tag == tab_tag:
+                stack[-1].append("\t")
+            elif elem.tag in break_tags:
+                stack[-1].append("\n")
+            elif elem.tag == para_tag:
+                yield "".join(stack.pop())
+                elem.clear()
+
+
+def _has_part(zf, part):
+    try:
+        zf.getinfo(part)
+        return True
+    except KeyError:
+        return False
+
+
+def _read_rels(zf, part):
+    """读取部件的关系表，返回 {rId: (类型, 目标部件路径)}"""
+    base, name = posixpath.split(part)
+    rels_part = posixpath.join(base, "_rels", name + ".rels")
+    if not _has_part(zf, rels_part):
+        return {}
+    rels = {}
+    root = ET.fromstring(zf.read(rels_part))
+    for rel in root.iter(REL_NS + "Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = posixpath.normpath(posixpath.join(base, rel.get("Target")))
+        rels[rel.get("Id")] = (rel.get("Type"), target)
+    return rels
+
+
+# ==================== DOCX ====================
+def iter_docx_paragraphs(file_path, include_notes=True):
+    """逐段落产出 DOCX 正文（含表格），可选附带脚注和尾注"""
+    with zipfile.ZipFile(file_path) as zf:
+        parts = ["word/document.xml"]
+        if include_notes:
+            parts += [p for p in ("word/footnotes.xml", "word/endnotes.xml") if _has_part(zf, p)]
+        for part in parts:
+            for text in iter_paragraphs(zf, part, W_NS):
+                yield text
+
+
+def extract_docx(file_path):
+    return '\n'.join(iter_docx_paragraphs(file_path))
+
+
+# ==================== PPTX ====================
+def slide_parts(zf):
+    """按演示文稿中的放映顺序返回幻灯片部件路径"""
+    pres_part = "ppt/presentation.xml"
+    rels = _read_rels(zf, pres_part)
+    root = ET.fromstring(zf.read(pres_part))
+    parts = []
+    for sld_id in root.iter(P_NS + "sldId"):
+        rel = rels.get(sld_id.get(R_NS + "id"))
+        if rel and _has_part(zf, rel[1]):
+            parts.append(rel[1])
+    if not parts:
+        # 关系表异常时退回按文件名中的编号排序
+        names = [n for n in zf.namelist() if re.match(r"ppt/slides/slide\d+\.xml$", n)]
+        parts = sorted(names, key=lambda n: int(re.search(r"(\d+)\.xml$", n).group(1)))
+    return parts
+
+
+def iter_pptx_slides(file_path, include_notes=True):
+    """逐张幻灯片产出文本（含组合形状、表格），可选附带演讲者备注"""
+    with zipfile.ZipFile(file_path) as zf:
+        for part in slide_parts(zf):
+            lines = list(iter_paragraphs(zf, part, A_NS))
+            if include_notes:
+                for rel_type, target in _read_rels(zf, part).values():
+                    if rel_type == NOTES_REL_TYPE and _has_part(zf, target):
+                        lines.extend(iter_paragraphs(zf, target, A_NS))
+            yield '\n'.join(line for line in lines if line.strip())
+
+
+def extract_pptx(file_path):
+    return '\n'.join(iter_pptx_slides(file_path))
+
+
+# ==================== 嵌入图片 ====================
+def _image_parts(zf, parts):
+    """按部件顺序列出其引用的图片，同一图片部件只列一次"""
+    seen = set()
+    for part in parts:
+        for rel_type, target in _read_rels(zf, part).values():
+            if rel_type != IMAGE_REL_TYPE or target in seen:
+                continue
+            seen.add(target)
+            if posixpath.splitext(target)[1].lower() in RASTER_EXTS and _has_part(zf, target):
+                yield target
+
+
+def iter_images(file_path):
+    """按出现顺序产出正文 / 幻灯片引用的图片字节
+
+    只看正文和幻灯片本身的关系表，母版、版式中的背景和 logo 不会被提取；
+    内容完全相同的图片（不同部件名）也只产出一次。
+    """
+    with zipfile.ZipFile(file_path) as zf:
+        if _has_part(zf, "ppt/presentation.xml"):
+            parts = slide_parts(zf)
+        else:
+            parts = ["word/document.xml"]
+        digests = set()
+        for target in _image_parts(zf, parts):
+            if zf.getinfo(target).file_size < MIN_IMAGE_BYTES:
+                continue
+            data = zf.read(target)
+            digest = hashlib.blake2b(data, digest_size=16).digest()
+            if digest in digests:
+                continue
+            digests.add(digest)
+            yield data
@@ -0,0 +1,252 @@
+"""
+隔离的内容提取工作进程。
+
+托盘程序原先在自己的进程里直接解析文件，一个损坏或超大的 PDF 就可能让
+delayed_classification 永远卡住，或把托盘进程的内存撑满。这里把提取放到
+常驻工作进程中执行，每个文件有墙钟超时（EXTRACT_TIMEOUT），安装了 psutil 时
+还会监控工作进程的常驻内存（EXTRACT_MAX_RSS_MB）。超时或超限的进程被终止并
+换一个新进程，该文件记为提取失败，之后再拖入同一内容时直接跳过，不会反复拖慢其他文件。
+"""
+import os
+import json
+import time
+import queue
+import threading
+import logging
+import importlib.util
+import multiprocessing
+from collections import OrderedDict
+import extract_cache
+
+# ==================== 配置参数 ====================
+CONFIG_FILE = "config.json"
+try:
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        config = json.load(f)
+except FileNotFoundError:
+    config = {}
+
+SANDBOX_ENABLED = config.get("SANDBOX_EXTRACT", True)
+SANDBOX_WORKERS = config.get("SANDBOX_WORKERS", 2)
+EXTRACT_TIMEOUT = config.get("EXTRACT_TIMEOUT", 120)
+EXTRACT_MAX_RSS_MB = config.get("EXTRACT_MAX_RSS_MB", 1024)
+# 监控内存的轮询间隔（秒）
+POLL_INTERVAL = 0.5
+MAX_FAILURES = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def _has_psutil():
+    return importlib.util.find_spec("psutil") is not None
+
+
+class ExtractFailed(Exception):
+    """文件在工作进程中提取超时、超出内存或导致进程崩溃"""
+
+
+class _WorkerGone(ExtractFailed):
+    """发送请求时工作进程已经退出（空闲时被系统结束或崩溃），与要提取的文件无关"""
+
+
+# ==================== 工作进程 ====================
+def _worker_main(conn):
+    """工作进程主循环：按需导入提取模块，逐个处理请求"""
+    import ocr_engine
+    import extractors
+    import tess_pool
+
+    # 每个工作进程一次只处理一个文件，单个文件内的 OCR 不再另开进程池，也不启动常驻 Tesseract 进程池：
+    # 守护进程不能创建子进程（会抛出 AssertionError 并被 OCR 调用吞掉，结果全为空），
+    # 而且这样终止工作进程时不会留下孤儿进程。OCR 在本进程内通过 pytesseract 完成
+    tess_pool.POOL_ENABLED = False
+    ocr_engine.set_worker_count(1)
+    while True:
+        try:
+            op, payload = conn.recv()
+        except (EOFError, OSError):
+            return
+        if op == "stop":
+            return
+        elif op == "extract":
+            file_path, kwargs = payload
+            try:
+                conn.send(("ok", extractors.extract_budgeted(file_path, **kwargs)))
+            except Exception as e:
+                conn.send(("error", str(e)))
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ps = None
+        if _has_psutil():
+            import psutil
+            try:
+                self.ps = psutil.Process(self.process.pid)
+            except psutil.Error:
+                self.ps = None
+
+    def rss_mb(self):
+        """工作进程（含其 OCR 子进程）的常驻内存，无 psutil 时返回 None"""
+        if self.ps is None:
+            return None
+        import psutil
+        try:
+            total = self.ps.memory_info().rss
+            for child in self.ps.children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except psutil.Error:
+                    pass
+            return total / 1024 / 1024
+        except psutil.Error:
+            return None
+
+    def call(self, op, payload, timeout, max_rss_mb):
+        """发送请求并等待结果；超时、超内存或进程退出时抛出 ExtractFailed"""
+        try:
+            self.conn.send((op, payload))
+        except (EOFError, OSError):
+            raise _WorkerGone(f"工作进程已退出（退出码 {self.process.exitcode}）")
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ExtractFailed(f"超过 {timeout}s 未完成")
+            try:
+                if self.conn.poll(min(POLL_INTERVAL, remaining)):
+                    status, result = self.conn.recv()
+                    break
+            except (EOFError, OSError):
+                raise ExtractFailed(f"工作进程退出（退出码 {self.process.exitcode}）")
+            if not self.process.is_alive():
+                raise ExtractFailed(f"工作进程退出（退出码 {self.process.exitcode}）")
+            rss = self.rss_mb()
+            if max_rss_mb and rss is not None and rss > max_rss_mb:
+                raise ExtractFailed(f"内存占用 {rss:.0f}MB 超过上限 {max_rss_mb}MB")
+        if status != "ok":
+            raise RuntimeError(result)
+        return result
+
+    def kill(self):
+        try:
+            self.conn.close()
+        finally:
+            if self.ps is not None:
+                import psutil
+                try:
+                    for child in self.ps.children(recursive=True):
+                        child.kill()
+                except psutil.Error:
+                    pass
+            if self.process.is_alive():
+                self.process.kill()
+            self.process.join(timeout=5)
+
+
+# ==================== 进程池 ====================
+class SandboxPool:
+    def __init__(self, size, timeout=EXTRACT_TIMEOUT, max_rss_mb=EXTRACT_MAX_RSS_MB):
+        self.ctx = multiprocessing.get_context("spawn")
+        self.idle = queue.Queue()
+        self.size = size
+        self.timeout = timeout
+        self.max_rss_mb = max_rss_mb
+        for _ in range(size):
+            self.idle.put(_Worker(self.ctx))
+
+    def extract(self, file_path, **kwargs):
+        """在工作进程中调用 extractors.extract_budgeted；失败的进程被替换后抛出 ExtractFailed"""
+        worker = self.idle.get()
+        try:
+            try:
+                result = worker.call("extract", (file_path, kwargs), self.timeout, self.max_rss_mb)
+            except _WorkerGone as e:
+                # 不是这个文件的问题：换一个新进程重试一次
+                worker = self._replace(worker, e)
+                result = worker.call("extract", (file_path, kwargs), self.timeout, self.max_rss_mb)
+        except ExtractFailed as e:
+            worker = self._replace(worker, e)
+            raise
+        finally:
+            self.idle.put(worker)
+        return result
+
+    def _replace(self, worker, reason):
+        logger.info(f"提取工作进程 {worker.process.pid} 被终止（{reason}），重新启动")
+        worker.kill()
+        return _Worker(self.ctx)
+
+    def close(self):
+        for _ in range(self.size):
+            worker = self.idle.get()
+            try:
+                worker.conn.send(("stop", None))
+                worker.process.join(timeout=2)
+            except OSError:
+                pass
+            worker.kill()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# 提取失败的文件：内容指纹 -> (文件名, 原因)
+_failures = OrderedDict()
+_failures_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool(SANDBOX_WORKERS)
+            limit = f"，内存上限 {EXTRACT_MAX_RSS_MB}MB" if _has_psutil() else "（未安装 psutil，不限制内存）"
+            logger.info(f"提取隔离进程池已启动：{SANDBOX_WORKERS} 个进程，超时 {EXTRACT_TIMEOUT}s{limit}")
+        return _pool
+
+
+def _record_failure(key, file_path, reason):
+    with _failures_lock:
+        _failures[key] = (os.path.basename(file_path), reason)
+        while len(_failures) > MAX_FAILURES:
+            _failures.popitem(last=False)
+
+
+def failures():
+    """返回已记录的提取失败 [(文件名, 原因)]"""
+    with _failures_lock:
+        return list(_failures.values())
+
+
+def extract(file_path, **kwargs):
+    """隔离提取文件内容；失败时记录并返回空字符串，由调用方退回文件名判断"""
+    try:
+        key = extract_cache.fingerprint(file_path)
+    except OSError as e:
+        logger.info(f"无法读取文件: {file_path} - {e}")
+        return ""
+    with _failures_lock:
+        if key in _failures:
+            logger.info(f"跳过曾提取失败的文件: {file_path}（{_failures[key][1]}）")
+            return ""
+    try:
+        return get_pool().extract(file_path, **kwargs)
+    except ExtractFailed as e:
+        logger.info(f"内容提取失败: {file_path} - {e}")
+        _record_failure(key, file_path, str(e))
+    except RuntimeError as e:
+        logger.info(f"内容提取失败: {file_path} - {e}")
+    return ""
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,222 @@
+"""
+常驻 Tesseract 工作进程池。
+
+pytesseract 每识别一张图都会启动一个 tesseract 进程并重新加载 chi_sim 语言数据，
+幻灯片这类小图上启动开销远大于识别本身。这里每个工作进程通过 tesserocr
+（libtesseract 的 Python 绑定）只加载一次语言数据，之后通过管道接收请求，
+图像放在共享内存中传递。工作进程崩溃或超时会被终止并重新拉起，
+后台线程定期 ping 空闲进程做健康检查。
+
+未安装 tesserocr 或在 config.json 中关闭 OCR_POOL 时 available() 返回 False，
+调用方继续使用 pytesseract。
+"""
+import os
+import json
+import time
+import queue
+import threading
+import logging
+import sys
+import importlib.util
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+
+# ==================== 配置参数 ====================
+CONFIG_FILE = "config.json"
+try:
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        config = json.load(f)
+except FileNotFoundError:
+    config = {}
+
+POOL_ENABLED = config.get("OCR_POOL", True)
+REQUEST_TIMEOUT = config.get("OCR_POOL_TIMEOUT", 120)
+CLOSE_TIMEOUT = config.get("OCR_POOL_CLOSE_TIMEOUT", 10)
+HEALTH_INTERVAL = config.get("OCR_POOL_HEALTH_INTERVAL", 30)
+TESSDATA_DIR = os.path.join(os.path.dirname(config.get(
+    "TESSERACT_PATH", r"C:\Program Files\Tesseract-OCR\tesseract.exe")), "tessdata")
+
+logger = logging.getLogger(__name__)
+
+HAS_TESSEROCR = importlib.util.find_spec("tesserocr") is not None
+_warned_missing = False
+
+
+def available():
+    global _warned_missing
+    if not POOL_ENABLED:
+        return False
+    if not HAS_TESSEROCR:
+        if not _warned_missing:
+            _warned_missing = True
+            logger.warning("未安装 tesserocr，OCR常驻进程池未启用，退回 pytesseract 逐次启动进程"
+                           "（Windows 需安装对应 Python 版本的 tesserocr wheel）")
+        return False
+    return True
+
+
+# ==================== 工作进程 ====================
+def _worker_main(conn, lang, tessdata_dir):
+    """工作进程主循环：语言数据只在这里加载一次"""
+    from PIL import Image
+    from tesserocr import PyTessBaseAPI
+
+    with PyTessBaseAPI(path=tessdata_dir, lang=lang) as api:
+        while True:
+            try:
+                op, payload = conn.recv()
+            except (EOFError, OSError):
+                return
+            if op == "ping":
+                conn.send(("ok", None))
+            elif op == "stop":
+                return
+            elif op == "ocr":
+                shm_name, shape = payload
+                shm = shared_memory.SharedMemory(name=shm_name)
+                if sys.platform != "win32":
+                    # 共享内存由主进程负责释放，避免资源跟踪器在子进程退出时重复清理
+                    from multiprocessing import resource_tracker
+                    resource_tracker.unregister(shm._name, "shared_memory")
+                try:
+                    image = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+                    api.SetImage(Image.fromarray(image))
+                    text = api.GetUTF8Text()
+                    confidence = api.MeanTextConf()
+                    del image
+                    conn.send(("ok", (text, confidence)))
+                except Exception as e:
+                    conn.send(("error", str(e)))
+                finally:
+                    shm.close()
+
+
+class _Worker:
+    def __init__(self, ctx, lang):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, lang, TESSDATA_DIR), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def call(self, op, payload=None, timeout=REQUEST_TIMEOUT):
+        self.conn.send((op, payload))
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"OCR工作进程 {timeout}s 内无响应")
+        status, result = self.conn.recv()
+        if status != "ok":
+            raise RuntimeError(result)
+        return result
+
+    def kill(self):
+        try:
+            self.conn.close()
+        finally:
+            if self.process.is_alive():
+                self.process.kill()
+            self.process.join(timeout=5)
+
+
+# ==================== 进程池 ====================
+class TesseractPool:
+    def __init__(self, size, lang):
+        self.lang = lang
+        self.ctx = multiprocessing.get_context("spawn")
+        self.idle = queue.Queue()
+        self.size = size
+        self.closed = False
+        for _ in range(size):
+            self.idle.put(_Worker(self.ctx, lang))
+        self.health_thread = threading.Thread(target=self._health_loop, daemon=True)
+        self.health_thread.start()
+
+    def _restart(self, worker, reason):
+        logger.info(f"OCR工作进程 {worker.process.pid} 异常（{reason}），重新启动")
+        worker.kill()
+        return _Worker(self.ctx, self.lang)
+
+    def recognize(self, binary):
+        """识别一张二值图像，返回 (文本, 平均置信度)；进程崩溃时换新进程重试一次"""
+        binary = np.ascontiguousarray(binary, dtype=np.uint8)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, binary.nbytes))
+        try:
+            np.ndarray(binary.shape, dtype=np.uint8, buffer=shm.buf)[...] = binary
+            for attempt in range(2):
+                worker = self.idle.get()
+                try:
+                    result = worker.call("ocr", (shm.name, binary.shape))
+                    self.idle.put(worker)
+                    return result
+                except RuntimeError:
+                    self.idle.put(worker)
+                    raise
+                except TimeoutError as e:
+                    # 超时多半是图像本身有问题，重启进程但不再重试
+                    self.idle.put(self._restart(worker, e))
+                    raise
+                except (EOFError, OSError) as e:
+                    self.idle.put(self._restart(worker, e))
+                    if attempt:
+                        raise
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def health_check(self):
+        """逐个 ping 当前空闲的进程，无响应的重新启动"""
+        for _ in range(self.idle.qsize()):
+            try:
+                worker = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                if not worker.process.is_alive():
+                    raise EOFError("进程已退出")
+                worker.call("ping", timeout=5)
+            except Exception as e:
+                worker = self._restart(worker, e)
+            self.idle.put(worker)
+
+    def _health_loop(self):
+        while not self.closed:
+            time.sleep(HEALTH_INTERVAL)
+            if not self.closed:
+                self.health_check()
+
+    def close(self):
+        self.closed = True
+        for _ in range(self.size):
+            try:
+                # 仍被借出的进程不等它归还，daemon 进程会随主进程退出
+                worker = self.idle.get(timeout=CLOSE_TIMEOUT)
+            except queue.Empty:
+                logger.warning(f"OCR工作进程 {CLOSE_TIMEOUT}s 内未归还，跳过关闭")
+                break
+            try:
+                worker.conn.send(("stop", None))
+                worker.process.join(timeout=2)
+            except OSError:
+                pass
+            worker.kill()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(size, lang):
+    """进程内共享的工作进程池，首次使用时启动"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TesseractPool(size, lang)
+            logger.info(f"OCR常驻进程池已启动：{size} 个进程，语言 {lang}")
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
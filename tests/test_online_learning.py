@@ -0,0 +1,55 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import lazy_loader
+import online_learning
+
+
+@pytest.fixture
+def versions(tmp_path, monkeypatch):
+    versions_dir = tmp_path / "model_versions"
+    monkeypatch.setattr(online_learning, "VERSIONS_DIR", str(versions_dir))
+    monkeypatch.setattr(online_learning, "CURRENT_FILE", str(versions_dir / "current.json"))
+    monkeypatch.setattr(online_learning, "KEEP_VERSIONS", 3)
+    base_file = tmp_path / "subject_classifier.pkl"
+    base_file.write_bytes(b"base")
+    return versions_dir, str(base_file)
+
+
+def existing(versions_dir):
+    return sorted(int(name[1:]) for name in os.listdir(versions_dir) if name.startswith("v"))
+
+
+def test_keeps_latest_versions(versions):
+    versions_dir, base_file = versions
+    for i in range(6):
+        info = online_learning.save_version({"clf": i}, {"vectorizer": i}, base_file, i)
+    assert info["version"] == 6
+    assert existing(versions_dir) == [4, 5, 6]
+    assert online_learning.current_version(base_file)["version"] == 6
+
+
+def test_never_prunes_version_in_use(versions):
+    versions_dir, base_file = versions
+    online_learning.save_version({"clf": 0}, {"vectorizer": 0}, base_file, 0)
+    for i in range(1, 6):
+        online_learning.save_version({"clf": i}, {"vectorizer": i}, base_file, i, in_use={1})
+    assert 1 in existing(versions_dir)
+    assert existing(versions_dir) == [1, 5, 6]
+    clf, vectorizer = online_learning.load_version({"kind": "pkl", "dir": str(versions_dir / "v0001")})
+    assert vectorizer == {"vectorizer": 0}
+
+
+def test_lazy_model_reports_loaded_version_after_swap(versions):
+    versions_dir, base_file = versions
+    online_learning.save_version({"clf": 0}, {"vectorizer": 0}, base_file, 0)
+    model = lazy_loader.LazyModel(compact=False)
+    model.base_file = lambda: base_file
+    clf, vectorizer = model.get()
+    assert model.in_use() == {1}
+    model.swap({"clf": 1}, vectorizer, 2)
+    # 词表仍来自 v0001，两个版本都不能删除
+    assert model.in_use() == {1, 2}
@@ -1,57 +1,568 @@
 import os
 import re
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
+import time
+import pickle
+import random
+import hashlib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.model_selection import train_test_split, ParameterGrid
+from sklearn.metrics import classification_report, accuracy_score
 import joblib
+import compact_model
+import corpus_store
+import near_dup
+from model_input import model_text
+
+# ==================== 读取与缓存参数 ====================
+LOAD_WORKERS = 8             # 并行读取训练文件的线程数
+FEATURE_CACHE_DIR = ".train_cache"   # 语料文本和向量化结果的缓存目录
+FEATURE_CACHE_KEEP = 8       # 最多保留的缓存文件数，超出时删除最久未用的
+TFIDF_PARAMS = {"max_features": 10000, "ngram_range": (1, 2)}
+TRAIN_DEDUP = True           # 读取后去掉近似重复的文档（MinHash，与托盘程序的 near_dup 相同）
+
+# ==================== 流式训练参数 ====================
+HASH_FEATURES = 2 ** 20      # 哈希特征维数，不保存词表
+STREAM_BATCH_SIZE = 256      # 每个小批量的文件数
+STREAM_EPOCHS = 3            # 遍历语料的轮数，每轮从磁盘重新读取
+HOLDOUT_PERCENT = 20         # 按文件路径哈希划出的测试集比例
+
+# ==================== 剪枝参数 ====================
+PRUNE_MIN_FEATURES = 100     # 按准确率损失搜索时最少保留的特征数
+PRUNE_STEP = 0.7             # 搜索时每次保留上一档特征数的比例
+
+# ==================== 超参数搜索参数 ====================
+SWEEP_WORKERS = 0            # 并行训练候选模型的进程数，0 表示按 CPU 核数
+SWEEP_LATENCY_DOCS = 200     # 测量单文档推理延迟所用的测试文档数
+SWEEP_VECTORIZER_GRID = {
+    "max_features": [2000, 5000, 10000],
+    "ngram_range": [(1, 1), (1, 2)],
+    "sublinear_tf": [False, True],
+}
+# (名称, 分类器类, 参数网格)；托盘程序需要 predict_proba，只列出支持概率输出的线性模型
+SWEEP_CLASSIFIERS = [
+    ("逻辑回归", LogisticRegression, {"C": [0.3, 1.0, 3.0, 10.0], "max_iter": [1000]}),
+    ("SGD", SGDClassifier, {"loss": ["log_loss"], "alpha": [1e-5, 1e-4, 1e-3], "random_state": [42]}),
+]
+
 
 def clean_text(text):
     return re.sub(r'\s+', ' ', text).strip()
 
-# 用户输入训练数据地址
-data_dir = input("请输入训练数据目录路径: ").strip()
-categories = [d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d))]
-
-texts = []
-labels = []
-
-print("正在加载训练数据...")
-for category in categories:
-    folder_path = os.path.join(data_dir, category)
-    for filename in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, filename)
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = clean_text(f.read())
-
-            # 使用文件名 + 文件内容作为特征
-            filename_base = os.path.splitext(filename)[0]
-            combined_text = f"{filename_base} {content}"
-            texts.append(combined_text)
+
+# ==================== 加载训练数据 ====================
+def open_store(data_dir):
+    """extract.py 写出的单文件语料库，不存在时返回 None（按学科目录读取 txt）"""
+    path = os.path.join(data_dir, corpus_store.STORE_NAME)
+    return corpus_store.get_store(path) if os.path.exists(path) else None
+
+
+def list_corpus(data_dir):
+    """列出 (相对路径, 学科) ，只保存路径，不读取内容"""
+    store = open_store(data_dir)
+    if store is not None:
+        # 内容指纹相同的文档只保留一份
+        return [(meta["source"], meta["label"]) for meta in store.entries()]
+    categories = [d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d))]
+    items = []
+    for category in categories:
+        folder_path = os.path.join(data_dir, category)
+        for filename in os.listdir(folder_path):
+            items.append((os.path.join(category, filename), category))
+    return items
+
+
+def read_text(data_dir, rel_path):
+    """读取单个训练文件，使用文件名 + 文件内容作为特征"""
+    store = open_store(data_dir)
+    if store is not None:
+        content = clean_text(store.read(rel_path))
+    else:
+        with open(os.path.join(data_dir, rel_path), "r", encoding="utf-8") as f:
+            content = clean_text(f.read())
+    return model_text(rel_path, content)
+
+
+def _read_or_skip(data_dir, rel_path):
+    try:
+        return read_text(data_dir, rel_path)
+    except Exception as e:
+        print(f"跳过文件 {os.path.join(data_dir, rel_path)}: {e}")
+        return None
+
+
+def load_corpus(data_dir, items=None):
+    """多线程并行读取（以磁盘 I/O 为主），结果顺序与 items 一致"""
+    items = items if items is not None else list_corpus(data_dir)
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as executor:
+        contents = list(executor.map(lambda item: _read_or_skip(data_dir, item[0]), items))
+    texts = []
+    labels = []
+    paths = []
+    for (rel_path, category), text in zip(items, contents):
+        if text is not None:
+            texts.append(text)
             labels.append(category)
+            paths.append(rel_path)
+    return texts, labels, paths
+
+
+# ==================== 语料与特征缓存 ====================
+def corpus_fingerprint(data_dir, items):
+    """按路径、学科、文件大小和修改时间计算，不读取文件内容；语料库按记录中的源文件指纹和提取器版本计算"""
+    store = open_store(data_dir)
+    digest = hashlib.sha1()
+    for rel_path, category in sorted(items):
+        if store is not None:
+            meta = store.get(rel_path)
+            digest.update(f"{rel_path}\0{category}\0{meta['fingerprint']}\0{meta['version']}\n".encode("utf-8"))
+            continue
+        stat = os.stat(os.path.join(data_dir, rel_path))
+        digest.update(f"{rel_path}\0{category}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _cache_path(kind, *parts):
+    key = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return os.path.join(FEATURE_CACHE_DIR, f"{kind}-{key}.joblib")
+
+
+def _cache_load(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        value = joblib.load(path)
+    except Exception as e:
+        print(f"缓存 {path} 读取失败，重新生成: {e}")
+        return None
+    os.utime(path)
+    return value
+
+
+def _cache_save(path, value):
+    os.makedirs(FEATURE_CACHE_DIR, exist_ok=True)
+    joblib.dump(value, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    names = [os.path.join(FEATURE_CACHE_DIR, n) for n in os.listdir(FEATURE_CACHE_DIR) if n.endswith(".joblib")]
+    for old in sorted(names, key=os.path.getmtime)[:max(0, len(names) - FEATURE_CACHE_KEEP)]:
+        os.remove(old)
+
+
+def dedup_corpus(texts, labels, paths):
+    """每组近似重复的文档只保留最先出现的一个"""
+    duplicates = near_dup.find_duplicates(texts)
+    if not duplicates:
+        return texts, labels, paths
+    conflicts = sum(1 for i, j in duplicates.items() if labels[i] != labels[j])
+    print(f"去掉 {len(duplicates)} 个近似重复文档" + (f"（其中 {conflicts} 个与保留的文档学科不同）" if conflicts else ""))
+    keep = [i for i in range(len(texts)) if i not in duplicates]
+    return [texts[i] for i in keep], [labels[i] for i in keep], [paths[i] for i in keep]
+
+
+def _dedup_key():
+    if not TRAIN_DEDUP:
+        return "dedup=False"
+    return f"dedup={near_dup.THRESHOLD}/{near_dup.SHINGLE_SIZE}/{near_dup.NUM_PERM}"
+
+
+def cached_corpus(data_dir, items=None):
+    """与 load_corpus 相同（开启 TRAIN_DEDUP 时去掉近似重复），语料未变化时直接读取缓存的文本"""
+    items = items if items is not None else list_corpus(data_dir)
+    path = _cache_path("corpus", corpus_fingerprint(data_dir, items), _dedup_key())
+    cached = _cache_load(path)
+    if cached is not None:
+        print(f"语料未变化，使用缓存的文本（{len(cached[0])} 个文件）")
+        return cached
+    corpus = load_corpus(data_dir, items)
+    if TRAIN_DEDUP:
+        corpus = dedup_corpus(*corpus)
+    _cache_save(path, corpus)
+    return corpus
+
+
+def dedup_items(data_dir, items):
+    """整个语料去掉近似重复后剩下的 (相对路径, 学科)
+
+    要先对全部文件去重再划分训练集和测试集：分别去重时，训练文档的近似副本会留在测试集里，准确率虚高。
+    """
+    if not TRAIN_DEDUP:
+        return items
+    _, _, paths = cached_corpus(data_dir, items)
+    keep = set(paths)
+    return [item for item in items if item[0] in keep]
+
+
+def cached_features(data_dir, params, items=None):
+    """在 items 上拟合 TfidfVectorizer(**params)，返回 (vectorizer, X, labels, paths)
+
+    语料和向量化参数都没变时直接读取缓存的词表和稀疏矩阵，不再读取文件和重新向量化。
+    """
+    items = items if items is not None else list_corpus(data_dir)
+    path = _cache_path("features", corpus_fingerprint(data_dir, items), _dedup_key(), sorted(params.items()))
+    cached = _cache_load(path)
+    if cached is not None:
+        print(f"语料和向量化参数未变化，使用缓存的特征矩阵 {cached[1].shape}")
+        return cached
+    texts, labels, paths = cached_corpus(data_dir, items)
+    vectorizer = TfidfVectorizer(**params)
+    X = vectorizer.fit_transform(texts)
+    _cache_save(path, (vectorizer, X, labels, paths))
+    return vectorizer, X, labels, paths
+
+
+def is_holdout(rel_path):
+    """按路径哈希确定是否属于测试集，多次运行、不同模式的划分完全一致"""
+    digest = hashlib.md5(rel_path.replace("\\", "/").encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "little") % 100 < HOLDOUT_PERCENT
+
+
+def pickled_size(*objs):
+    """模型序列化后的字节数"""
+    return sum(len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)) for obj in objs)
+
+
+# ==================== TF-IDF + 逻辑回归 ====================
+def train_tfidf(texts, labels):
+    vectorizer = TfidfVectorizer(**TFIDF_PARAMS)
+    X = vectorizer.fit_transform(texts)
+    clf = LogisticRegression(max_iter=1000)
+    clf.fit(X, labels)
+    return clf, vectorizer
+
+
+def run_tfidf(data_dir):
+    print("正在加载训练数据...")
+    # 读取和向量化结果按语料指纹缓存，只改分类器参数重新训练时直接复用
+    vectorizer, X, labels, _ = cached_features(data_dir, TFIDF_PARAMS)
+
+    # 划分训练/测试集
+    X_train, X_test, y_train, y_test = train_test_split(X, labels, test_size=0.2, random_state=42)
+
+    # 训练模型
+    clf = LogisticRegression(max_iter=1000)
+    clf.fit(X_train, y_train)
+
+    # 评估
+    y_pred = clf.predict(X_test)
+    print("\n分类报告：")
+    print(classification_report(y_test, y_pred))
+
+    # 保存模型
+    joblib.dump(clf, "subject_classifier.pkl")
+    joblib.dump(vectorizer, "tfidf_vectorizer.pkl")
+
+    print("\n✅ 模型训练完成，已保存为 subject_classifier.pkl 和 tfidf_vectorizer.pkl")
+    export_compact(clf, vectorizer)
+
+
+def export_compact(clf, vectorizer):
+    """导出紧凑模型，托盘程序加载时不需要导入 sklearn"""
+    size = compact_model.export(clf, vectorizer)
+    print(f"✅ 紧凑模型已导出到 {compact_model.MODEL_DIR}/（{size / 1024 / 1024:.1f}MB，"
+          f"pkl 为 {pickled_size(clf, vectorizer) / 1024 / 1024:.1f}MB）")
+
+
+def run_export(data_dir=None):
+    """把已有的 subject_classifier.pkl / tfidf_vectorizer.pkl 导出为紧凑模型"""
+    clf = joblib.load("subject_classifier.pkl")
+    vectorizer = joblib.load("tfidf_vectorizer.pkl")
+    export_compact(clf, vectorizer)
+
+
+# ==================== 流式训练（哈希特征 + SGD）====================
+def make_hashing_vectorizer():
+    # 与 TF-IDF 使用相同的分词方式；alternate_sign=False 保证特征值非负
+    return HashingVectorizer(n_features=HASH_FEATURES, ngram_range=(1, 2),
+                             alternate_sign=False, norm="l2")
+
+
+def iter_batches(data_dir, items, batch_size):
+    """逐批读取文件内容（批内并行读取），内存中只保留一个小批量"""
+    for i in range(0, len(items), batch_size):
+        texts, labels, _ = load_corpus(data_dir, items[i:i + batch_size])
+        if texts:
+            yield texts, labels
+
+
+def train_streaming(data_dir, train_items, classes, epochs=STREAM_EPOCHS, batch_size=STREAM_BATCH_SIZE):
+    """partial_fit 逐批训练；每轮打乱文件顺序，避免一个批次里只有一个学科"""
+    vectorizer = make_hashing_vectorizer()
+    clf = SGDClassifier(loss="log_loss", random_state=42)
+    for epoch in range(epochs):
+        order = list(train_items)
+        random.Random(42 + epoch).shuffle(order)
+        seen = 0
+        start = time.perf_counter()
+        for texts, labels in iter_batches(data_dir, order, batch_size):
+            clf.partial_fit(vectorizer.transform(texts), labels, classes=classes)
+            seen += len(texts)
+        print(f"第 {epoch + 1}/{epochs} 轮：{seen} 个文件，耗时 {time.perf_counter() - start:.1f}s")
+    return clf, vectorizer
+
+
+def evaluate_streaming(data_dir, test_items, clf, vectorizer, batch_size=STREAM_BATCH_SIZE):
+    y_true, y_pred = [], []
+    for texts, labels in iter_batches(data_dir, test_items, batch_size):
+        y_true.extend(labels)
+        y_pred.extend(clf.predict(vectorizer.transform(texts)))
+    return y_true, y_pred
+
+
+def split_items(items):
+    train_items = [item for item in items if not is_holdout(item[0])]
+    test_items = [item for item in items if is_holdout(item[0])]
+    return train_items, test_items
+
+
+def run_streaming(data_dir):
+    items = list_corpus(data_dir)
+    classes = sorted({category for _, category in items})
+    train_items, test_items = split_items(items)
+    print(f"共 {len(items)} 个文件：训练 {len(train_items)}，测试 {len(test_items)}，按小批量流式读取")
+
+    clf, vectorizer = train_streaming(data_dir, train_items, classes)
+    y_true, y_pred = evaluate_streaming(data_dir, test_items, clf, vectorizer)
+    print("\n分类报告：")
+    print(classification_report(y_true, y_pred))
+
+    joblib.dump(clf, "hashing_classifier.pkl")
+    joblib.dump(vectorizer, "hashing_vectorizer.pkl")
+    print(f"\n✅ 流式模型训练完成（{pickled_size(clf, vectorizer) / 1024 / 1024:.1f}MB），"
+          f"已保存为 hashing_classifier.pkl 和 hashing_vectorizer.pkl")
+
+
+def run_compare(data_dir):
+    """在同一个测试集上对比两种模式的准确率、训练耗时和模型大小"""
+    items = dedup_items(data_dir, list_corpus(data_dir))
+    classes = sorted({category for _, category in items})
+    train_items, test_items = split_items(items)
+    print(f"共 {len(items)} 个文件：训练 {len(train_items)}，测试 {len(test_items)}")
+
+    rows = []
+    start = time.perf_counter()
+    texts, labels, _ = load_corpus(data_dir, train_items)
+    clf, vectorizer = train_tfidf(texts, labels)
+    train_seconds = time.perf_counter() - start
+    del texts
+    test_texts, test_labels, _ = load_corpus(data_dir, test_items)
+    accuracy = accuracy_score(test_labels, clf.predict(vectorizer.transform(test_texts)))
+    rows.append(("TF-IDF + 逻辑回归", accuracy, train_seconds, pickled_size(clf, vectorizer)))
+
+    start = time.perf_counter()
+    clf, vectorizer = train_streaming(data_dir, train_items, classes)
+    train_seconds = time.perf_counter() - start
+    y_true, y_pred = evaluate_streaming(data_dir, test_items, clf, vectorizer)
+    rows.append(("哈希特征 + SGD（流式）", accuracy_score(y_true, y_pred), train_seconds,
+                 pickled_size(clf, vectorizer)))
+
+    print(f"\n{'模式':<24}{'准确率':>10}{'训练耗时(s)':>14}{'模型大小(MB)':>14}")
+    for name, accuracy, seconds, size in rows:
+        print(f"{name:<24}{accuracy:>10.2%}{seconds:>14.1f}{size / 1024 / 1024:>14.1f}")
+
+
+# ==================== 剪枝 ====================
+def prune_model(clf, vectorizer, texts, labels, n_features):
+    """保留各学科系数绝对值最大值排名前 n_features 的词项，并在剪枝后的特征上重新训练
+
+    只截取系数矩阵的列会改变 L2 归一化的分母，所以用新词表重新向量化后再拟合。
+    """
+    importance = np.abs(clf.coef_).max(axis=0)
+    keep = np.sort(np.argsort(importance)[::-1][:n_features])
+    terms = vectorizer.get_feature_names_out()
+    params = vectorizer.get_params()
+    params.update(vocabulary={terms[i]: j for j, i in enumerate(keep)}, max_features=None)
+    pruned_vectorizer = TfidfVectorizer(**params)
+    pruned_vectorizer.idf_ = vectorizer.idf_[keep]
+    pruned_clf = LogisticRegression(**clf.get_params())
+    pruned_clf.fit(pruned_vectorizer.transform(texts), labels)
+    return pruned_clf, pruned_vectorizer
+
+
+def search_features(texts, labels, max_loss):
+    """在训练集内再划出验证集，找出准确率损失不超过 max_loss 的最小特征数"""
+    fit_texts, val_texts, fit_labels, val_labels = train_test_split(
+        texts, labels, test_size=0.2, random_state=0)
+    clf, vectorizer = train_tfidf(fit_texts, fit_labels)
+    base = accuracy_score(val_labels, clf.predict(vectorizer.transform(val_texts)))
+    best = n_features = len(vectorizer.vocabulary_)
+    while True:
+        n_features = int(n_features * PRUNE_STEP)
+        if n_features < PRUNE_MIN_FEATURES:
+            break
+        pruned_clf, pruned_vectorizer = prune_model(clf, vectorizer, fit_texts, fit_labels, n_features)
+        accuracy = accuracy_score(val_labels, pruned_clf.predict(pruned_vectorizer.transform(val_texts)))
+        print(f"  保留 {n_features} 个特征：验证集准确率 {accuracy:.2%}（剪枝前 {base:.2%}）")
+        if accuracy < base - max_loss:
+            break
+        best = n_features
+    return best
+
+
+def measure_model(clf, vectorizer, texts, labels):
+    """模型大小、反序列化耗时、单个文档推理耗时和准确率"""
+    data = pickle.dumps((clf, vectorizer), protocol=pickle.HIGHEST_PROTOCOL)
+    start = time.perf_counter()
+    pickle.loads(data)
+    load_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    predictions = [clf.predict(vectorizer.transform([text]))[0] for text in texts]
+    latency = (time.perf_counter() - start) / max(1, len(texts))
+    return {"features": len(vectorizer.vocabulary_), "size": len(data), "load": load_seconds,
+            "latency": latency, "accuracy": accuracy_score(labels, predictions)}
+
+
+def run_prune(data_dir):
+    print("正在加载训练数据...")
+    texts, labels, _ = cached_corpus(data_dir)
+    train_texts, test_texts, y_train, y_test = train_test_split(texts, labels, test_size=0.2, random_state=42)
+    clf, vectorizer = train_tfidf(train_texts, y_train)
+    before = measure_model(clf, vectorizer, test_texts, y_test)
+
+    target = input("剪枝目标：输入保留的特征数（如 2000），或允许的准确率损失（如 0.01）: ").strip()
+    if "." in target:
+        print("正在搜索满足准确率损失的最小特征数...")
+        n_features = search_features(train_texts, y_train, float(target))
+    else:
+        n_features = int(target)
+    n_features = min(n_features, len(vectorizer.vocabulary_))
+    clf, vectorizer = prune_model(clf, vectorizer, train_texts, y_train, n_features)
+    after = measure_model(clf, vectorizer, test_texts, y_test)
+
+    print(f"\n{'':<16}{'剪枝前':>14}{'剪枝后':>14}")
+    print(f"{'特征数':<16}{before['features']:>14}{after['features']:>14}")
+    print(f"{'模型大小(MB)':<16}{before['size'] / 1024 / 1024:>14.2f}{after['size'] / 1024 / 1024:>14.2f}")
+    print(f"{'加载耗时(ms)':<16}{before['load'] * 1000:>14.1f}{after['load'] * 1000:>14.1f}")
+    print(f"{'单文档推理(ms)':<16}{before['latency'] * 1000:>14.2f}{after['latency'] * 1000:>14.2f}")
+    print(f"{'准确率':<16}{before['accuracy']:>14.2%}{after['accuracy']:>14.2%}")
+
+    joblib.dump(clf, "subject_classifier.pkl")
+    joblib.dump(vectorizer, "tfidf_vectorizer.pkl")
+    print("\n✅ 剪枝后的模型已保存为 subject_classifier.pkl 和 tfidf_vectorizer.pkl")
+    export_compact(clf, vectorizer)
+
+
+# ==================== 超参数搜索 ====================
+def sweep_candidates(sample=None):
+    """展开向量化参数 x 分类器参数的全部组合，sample 为整数时从中随机抽取这么多个"""
+    candidates = []
+    for vectorizer_params in ParameterGrid(SWEEP_VECTORIZER_GRID):
+        for name, model_class, grid in SWEEP_CLASSIFIERS:
+            for clf_params in ParameterGrid(grid):
+                candidates.append((vectorizer_params, name, model_class, clf_params))
+    if sample and sample < len(candidates):
+        candidates = random.Random(42).sample(candidates, sample)
+    return candidates
+
+
+def fit_candidate(model_class, clf_params, X_train, y_train, X_test, y_test):
+    """在工作进程中训练一个候选分类器，返回 (clf, 训练耗时, 测试集准确率)"""
+    start = time.perf_counter()
+    clf = model_class(**clf_params).fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    return clf, fit_seconds, accuracy_score(y_test, clf.predict(X_test))
+
+
+def inference_latency(clf, vectorizer, texts):
+    """与托盘程序一样逐个文档向量化并预测，返回平均耗时（秒）"""
+    start = time.perf_counter()
+    for text in texts:
+        clf.predict(vectorizer.transform([text]))
+    return (time.perf_counter() - start) / max(1, len(texts))
+
+
+def describe(params):
+    return ", ".join(f"{k}={v}" for k, v in sorted(params.items()) if k not in ("max_iter", "random_state"))
+
+
+def run_sweep(data_dir):
+    sample = input("搜索方式：直接回车为网格搜索全部组合，输入数字 N 为随机抽取 N 个组合: ").strip()
+    candidates = sweep_candidates(int(sample) if sample else None)
+
+    # 向量化参数相同的候选共用同一个特征矩阵（并按语料指纹缓存到磁盘）
+    groups = {}
+    for candidate in candidates:
+        groups.setdefault(tuple(sorted(candidate[0].items())), []).append(candidate)
+    # 每次搜索按相同顺序依次访问各组，缓存数少于 组数 + 3 个语料（全部、训练、测试）时，
+    # 按最久未用淘汰会在下次用到之前删掉每一个特征矩阵，语料不变也要全部重新向量化
+    global FEATURE_CACHE_KEEP
+    FEATURE_CACHE_KEEP = max(FEATURE_CACHE_KEEP, len(groups) + 3)
+
+    train_items, test_items = split_items(dedup_items(data_dir, list_corpus(data_dir)))
+    test_texts, y_test, _ = cached_corpus(data_dir, test_items)
+    print(f"共 {len(candidates)} 个组合，{len(groups)} 种向量化参数；训练 {len(train_items)}，测试 {len(test_items)}")
+
+    results = []
+    with joblib.Parallel(n_jobs=SWEEP_WORKERS or -1) as parallel:
+        for key, group in groups.items():
+            vectorizer, X_train, y_train, _ = cached_features(data_dir, dict(key), train_items)
+            X_test = vectorizer.transform(test_texts)
+            fitted = parallel(joblib.delayed(fit_candidate)(model_class, clf_params, X_train, y_train, X_test, y_test)
+                              for _, _, model_class, clf_params in group)
+            for (vectorizer_params, name, _, clf_params), (clf, fit_seconds, accuracy) in zip(group, fitted):
+                # 推理延迟在并行训练结束后于主进程中逐个测量，避免争抢 CPU 影响结果
+                results.append({
+                    "name": f"{name}（{describe(clf_params)}；{describe(vectorizer_params)}）",
+                    "accuracy": accuracy,
+                    "latency": inference_latency(clf, vectorizer, test_texts[:SWEEP_LATENCY_DOCS]),
+                    "size": pickled_size(clf, vectorizer),
+                    "fit": fit_seconds,
+                    "clf": clf,
+                    "vectorizer": vectorizer,
+                })
+            print(f"  已完成 {len(results)}/{len(candidates)}")
+
+    results.sort(key=lambda r: (-r["accuracy"], r["latency"]))
+    print(f"\n{'准确率':>8}{'单文档推理(ms)':>16}{'模型大小(MB)':>14}{'训练耗时(s)':>12}  参数")
+    for r in results:
+        print(f"{r['accuracy']:>8.2%}{r['latency'] * 1000:>16.2f}{r['size'] / 1024 / 1024:>14.2f}"
+              f"{r['fit']:>12.1f}  {r['name']}")
+
+    best = results[0]["accuracy"]
+    bar = input(f"\n准确率要求（如 0.95，直接回车为最高准确率 {best:.2%} 减 1%）: ").strip()
+    bar = float(bar) if bar else best - 0.01
+    eligible = [r for r in results if r["accuracy"] >= bar]
+    if not eligible:
+        print(f"没有准确率达到 {bar:.2%} 的组合")
+        return
+    chosen = min(eligible, key=lambda r: r["latency"])
+    print(f"满足要求且推理最快：{chosen['name']}\n"
+          f"  准确率 {chosen['accuracy']:.2%}，单文档推理 {chosen['latency'] * 1000:.2f}ms，"
+          f"模型大小 {chosen['size'] / 1024 / 1024:.2f}MB")
 
-        except Exception as e:
-            print(f"跳过文件 {file_path}: {e}")
+    if input("是否保存该模型并导出紧凑格式？(y/N): ").strip().lower() == "y":
+        joblib.dump(chosen["clf"], "subject_classifier.pkl")
+        joblib.dump(chosen["vectorizer"], "tfidf_vectorizer.pkl")
+        print("\n✅ 已保存为 subject_classifier.pkl 和 tfidf_vectorizer.pkl")
+        export_compact(chosen["clf"], chosen["vectorizer"])
 
-# 向量化
-vectorizer = TfidfVectorizer(max_features=10000, ngram_range=(1, 2))
-X = vectorizer.fit_transform(texts)
 
-# 划分训练/测试集
-X_train, X_test, y_train, y_test = train_test_split(X, labels, test_size=0.2, random_state=42)
+# ==================== 主程序入口 ====================
+MODES = {
+    "1": ("TF-IDF + 逻辑回归（默认）", run_tfidf),
+    "2": ("流式训练：哈希特征 + SGD，适合内存放不下的语料", run_streaming),
+    "3": ("对比以上两种模式的准确率和模型大小", run_compare),
+    "4": ("不重新训练，把现有 TF-IDF 模型导出为紧凑格式", run_export),
+    "5": ("TF-IDF 训练后剪枝：去掉低权重特征，缩小模型", run_prune),
+    "6": ("超参数搜索：并行训练多组参数，选出满足准确率要求且推理最快的模型", run_sweep),
+}
 
-# 训练模型
-clf = LogisticRegression(max_iter=1000)
-clf.fit(X_train, y_train)
 
-# 评估
-y_pred = clf.predict(X_test)
-print("\n分类报告：")
-print(classification_report(y_test, y_pred))
+def main():
+    for key, (name, _) in MODES.items():
+        print(f"  {key}. {name}")
+    mode = input("请选择训练模式（直接回车为 1）: ").strip() or "1"
+    if mode not in MODES:
+        print(f"未知的训练模式：{mode}")
+        return
+    if mode == "4":
+        run_export()
+        return
+    # 用户输入训练数据地址
+    data_dir = input("请输入训练数据目录路径: ").strip()
+    MODES[mode][1](data_dir)
 
-# 保存模型
-joblib.dump(clf, "subject_classifier.pkl")
-joblib.dump(vectorizer, "tfidf_vectorizer.pkl")
 
-print("\n✅ 模型训练完成，已保存为 subject_classifier.pkl 和 tfidf_vectorizer.pkl")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+MP4 课程录像内容提取：先读容器元数据（标题、注释等），再跳转到少量关键帧做 OCR。
+
+元数据直接解析 MP4 的 box 结构（moov/udta/meta/ilst），只读文件头尾的几 KB；
+画面用 OpenCV 按时间戳跳转到最近的关键帧，只解码被抽到的几帧，不解码整段视频。
+每个视频的总耗时受 VIDEO_TIME_LIMIT 限制，两小时的录像和几分钟的短片成本相近。
+"""
+import os
+import json
+import time
+import struct
+import logging
+import cv2
+import ocr_engine
+
+# ==================== 配置参数 ====================
+CONFIG_FILE = "config.json"
+try:
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        config = json.load(f)
+except FileNotFoundError:
+    config = {}
+
+VIDEO_MAX_FRAMES = config.get("VIDEO_MAX_FRAMES", 8)
+VIDEO_TIME_LIMIT = config.get("VIDEO_TIME_LIMIT", 30)
+# 片头标题卡通常在开头几秒出现
+TITLE_CARD_SECONDS = 3
+
+logger = logging.getLogger(__name__)
+
+# iTunes 风格元数据中承载文字的标签
+TEXT_ATOMS = {
+    b"\xa9nam": "标题",
+    b"\xa9cmt": "注释",
+    b"desc": "描述",
+    b"ldes": "详细描述",
+    b"\xa9alb": "专辑",
+    b"\xa9ART": "作者",
+    b"\xa9grp": "分组",
+    b"\xa9gen": "类型",
+    b"titl": "标题",
+}
+CONTAINER_ATOMS = {b"moov", b"udta", b"meta", b"ilst"}
+
+
+# ==================== 容器元数据 ====================
+def _iter_boxes(f, start, end):
+    """遍历 [start, end) 范围内的 box，产出 (类型, 数据起点, 数据终点)"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header)
+        offset = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            offset = 16
+        elif size == 0:
+            size = end - pos
+        if size < offset:
+            return
+        yield box_type, pos + offset, min(pos + size, end)
+        pos += size
+
+
+def _read_ilst_text(f, start, end):
+    texts = {}
+    for box_type, data_start, data_end in _iter_boxes(f, start, end):
+        label = TEXT_ATOMS.get(box_type)
+        if not label:
+            continue
+        for child_type, child_start, child_end in _iter_boxes(f, data_start, data_end):
+            # data box: 4 字节类型标识 + 4 字节语言，后面是 UTF-8 文本
+            if child_type == b"data" and child_end - child_start > 8:
+                f.seek(child_start + 8)
+                value = f.read(min(child_end - child_start - 8, 64 * 1024))
+                texts[label] = value.decode("utf-8", errors="ignore").strip()
+    return texts
+
+
+def read_metadata(file_path):
+    """读取 MP4 元数据中的文字字段，返回 {字段名: 文本}"""
+    texts = {}
+    file_size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        def walk(start, end, depth):
+            for box_type, data_start, data_end in _iter_boxes(f, start, end):
+                if box_type == b"ilst":
+                    texts.update(_read_ilst_text(f, data_start, data_end))
+                elif box_type in CONTAINER_ATOMS and depth < 4:
+                    # meta 是 full box，子 box 前有 4 字节版本/标志
+                    skip = 4 if box_type == b"meta" else 0
+                    walk(data_start + skip, data_end, depth + 1)
+        walk(0, file_size, 0)
+    return texts
+
+
+# ==================== 关键帧 OCR ====================
+def sample_timestamps(duration, max_frames=VIDEO_MAX_FRAMES):
+    """片头标题卡一帧，其余在全片均匀分布（避开片头片尾）"""
+    if duration <= 0:
+        return [0.0]
+    stamps = [min(TITLE_CARD_SECONDS, duration / 2)]
+    rest = max_frames - 1
+    for i in range(rest):
+        stamps.append(duration * (i + 1) / (rest + 1))
+    return sorted(set(round(s, 1) for s in stamps))
+
+
+def iter_keyframe_text(file_path, time_limit=VIDEO_TIME_LIMIT, max_frames=VIDEO_MAX_FRAMES):
+    """逐帧产出抽样帧的 OCR 文本，超过 time_limit 即停止"""
+    started = time.monotonic()
+    cap = cv2.VideoCapture(file_path)
+    try:
+        if not cap.isOpened():
+            logger.info(f"视频无法打开: {file_path}")
+            return
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0
+        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+        duration = frame_count / fps if fps else 0
+        stamps = sample_timestamps(duration, max_frames)
+        done = 0
+        for stamp in stamps:
+            if time_limit is not None and time.monotonic() - started >= time_limit:
+                break
+            # 按时间戳跳转由解码后端定位到附近的关键帧，只解码这一帧
+            cap.set(cv2.CAP_PROP_POS_MSEC, stamp * 1000)
+            ok, frame = cap.read()
+            if not ok:
+                continue
+            done += 1
+            text = ocr_engine.ocr_array(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+            if text.strip():
+                yield text
+        logger.info(f"视频关键帧OCR {os.path.basename(file_path)}：时长{duration:.0f}s，"
+                    f"抽样{done}/{len(stamps)}帧，耗时{time.monotonic() - started:.1f}s")
+    finally:
+        cap.release()
+
+
+def iter_mp4(file_path, time_limit=VIDEO_TIME_LIMIT, ocr=True):
+    """先产出元数据文字，再产出关键帧 OCR 文本"""
+    try:
+        metadata = read_metadata(file_path)
+    except (OSError, struct.error) as e:
+        logger.info(f"视频元数据读取失败: {file_path} - {e}")
+        metadata = {}
+    if metadata:
+        yield '\n'.join(metadata.values())
+    if ocr:
+        yield from iter_keyframe_text(file_path, time_limit)